@@ -1,4 +1,17 @@
 """Poller business logic"""
-from .raiden_poller_service import MetricsService
 
-__all__ = ["MetricsService"]
+__all__ = ["MetricsService", "AsyncMetricsService"]
+
+
+def __getattr__(name: str):
+    # the services are imported on first access, so that embedding the asyncio
+    # service doesn't import gevent
+    if name == "MetricsService":
+        from .raiden_poller_service import MetricsService
+
+        return MetricsService
+    if name == "AsyncMetricsService":
+        from .async_raiden_poller_service import AsyncMetricsService
+
+        return AsyncMetricsService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
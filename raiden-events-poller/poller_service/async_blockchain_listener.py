@@ -0,0 +1,415 @@
+"""Module containing the class 'AsyncBlockchainListener', the asyncio twin of 'BlockchainListener'."""
+import asyncio
+import heapq
+import logging
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+from eth_utils import to_checksum_address
+from raiden_contracts.contract_manager import ContractManager
+
+from .async_rpc import AsyncRPCClient, sleep_or_stop
+from .checkpoint import restore_checkpoint, store_checkpoint
+from .event_deduplicator import EventDeduplicator
+from .events import decode_event, get_filter_params
+from .poll_scheduler import PollScheduler
+from .profiling import tracer
+
+log = logging.getLogger(__name__)
+
+
+def split_block_range(
+    from_block: int, to_block: int, chunk_size: int
+) -> List[Tuple[int, int]]:
+    """Splits the inclusive range [from_block, to_block] into inclusive chunks"""
+    assert chunk_size > 0
+    return [
+        (start, min(start + chunk_size - 1, to_block))
+        for start in range(from_block, to_block + 1, chunk_size)
+    ]
+
+
+# pylint: disable=R0902
+class AsyncBlockchainListener:
+    """ A class listening for events on a given contract, running as an asyncio task. """
+
+    def __init__(
+        self,
+        rpc: AsyncRPCClient,
+        contract_manager: ContractManager,
+        contract_name: str,
+        contract_address: str,
+        *,  # require all following arguments to be keyword arguments
+        required_confirmations: int = 4,
+        sync_chunk_size: int = 100_000,
+        fetch_chunk_size: int = 10000,
+        max_concurrent_fetches: int = 4,
+        poll_interval: int = 15,
+        sync_start_block: int = 0,
+        checkpoint_path: Optional[str] = None,
+        dedup_max_entries: int = 10000,
+        scheduler: Optional[PollScheduler] = None,
+    ) -> None:
+        """Creates a new AsyncBlockchainListener
+
+        Args:
+            rpc: An AsyncRPCClient instance
+            contract_manager: A contract manager
+            contract_name: The name of the contract
+            required_confirmations: The number of confirmations required to call a block confirmed
+            sync_chunk_size: The size of the chunks used during syncing
+            fetch_chunk_size: The size of the block ranges fetched concurrently within a chunk
+            max_concurrent_fetches: The maximum number of in-flight `eth_getLogs` requests
+            poll_interval: The interval used between polls if no scheduler is given
+            sync_start_block: The block number syncing is started at
+            checkpoint_path: File the progress is persisted to and resumed from, if given
+            dedup_max_entries: The maximum number of event keys kept for deduplication
+            scheduler: A PollScheduler, possibly shared with other listeners, adapting
+                the interval between polls
+        """
+        self.contract_manager = contract_manager
+        self.contract_name = contract_name
+        self.contract_address = contract_address
+
+        self.required_confirmations = required_confirmations
+        self.rpc = rpc
+
+        self.confirmed_callbacks: Dict[int, Tuple[List, Callable]] = {}
+        self.unconfirmed_callbacks: Dict[int, Tuple[List, Callable]] = {}
+
+        self.wait_sync_event = asyncio.Event()
+        self.is_connected = asyncio.Event()
+        self.stop_event = asyncio.Event()
+        self.sync_chunk_size = sync_chunk_size
+        self.fetch_chunk_size = fetch_chunk_size
+        self.fetch_semaphore = asyncio.Semaphore(max_concurrent_fetches)
+        # trace track numbers of the fetches not in flight, one per semaphore slot
+        self.free_fetch_tracks = list(range(max_concurrent_fetches))
+        self.running = False
+        self.poll_interval = poll_interval
+        self.scheduler = scheduler
+        self.last_pass_events: Optional[int] = None
+        self.task: Optional[asyncio.Future] = None
+
+        self.unconfirmed_head_number = sync_start_block
+        self.confirmed_head_number = sync_start_block
+        self.unconfirmed_head_hash = None
+        self.confirmed_head_hash = None
+
+        self.counter = 0
+
+        self.deduplicator = EventDeduplicator(dedup_max_entries)
+        self.checkpoint_path = checkpoint_path
+        if self.checkpoint_path is not None:
+            restore_checkpoint(self, self.checkpoint_path)
+
+    def add_confirmed_listener(self, topics: List, callback: Callable):
+        """ Add a callback to listen for confirmed events. """
+        self.confirmed_callbacks[self.counter] = (topics, callback)
+        self.counter += 1
+
+    def add_unconfirmed_listener(self, topics: List, callback: Callable):
+        """ Add a callback to listen for unconfirmed events. """
+        self.unconfirmed_callbacks[self.counter] = (topics, callback)
+        self.counter += 1
+
+    @property
+    def requests_per_pass(self) -> int:
+        """Rough number of RPC requests made by a single pass of `_update`,
+        not counting the `eth_getLogs` requests which `_fetch_events` reserves itself"""
+        return 5
+
+    def _next_poll_delay(self) -> float:
+        if self.scheduler is None:
+            return self.poll_interval
+        return self.scheduler.next_poll_delay(
+            self.contract_address,
+            self.unconfirmed_head_number,
+            self.last_pass_events,
+            self.requests_per_pass,
+        )
+
+    def start(self) -> asyncio.Future:
+        """ Schedules the polling loop on the running event loop. """
+        self.task = asyncio.ensure_future(self._run())
+        return self.task
+
+    async def _run(self):
+        self.running = True
+        log.info("Starting blockchain polling (interval %ss)", self.poll_interval)
+        while self.running:
+            try:
+                with tracer.span("update", self.contract_address):
+                    await self._update()
+                self.is_connected.set()
+                if self.wait_sync_event.is_set():
+                    await sleep_or_stop(self.stop_event, self._next_poll_delay())
+                elif self.scheduler is not None:
+                    await sleep_or_stop(
+                        self.stop_event,
+                        self.scheduler.catch_up_delay(self.requests_per_pass),
+                    )
+            except aiohttp.ClientConnectionError:
+                log.warning(
+                    "Ethereum node (%s) refused connection. Retrying in %d seconds."
+                    % (self.rpc.endpoint_uri, self.poll_interval)
+                )
+                await sleep_or_stop(self.stop_event, self.poll_interval)
+                self.is_connected.clear()
+        log.info("Stopped blockchain polling")
+
+    def stop(self):
+        """ Stops the AsyncBlockchainListener after the current pass. """
+        self.running = False
+        self.stop_event.set()
+
+    async def wait_sync(self):
+        """Waits until event polling is up-to-date with a most recent block of the blockchain. """
+        await self.wait_sync_event.wait()
+
+    async def _update(self):
+        self.last_pass_events = None
+        current_block = await self.rpc.block_number()
+
+        # reset unconfirmed channels in case of reorg
+        with tracer.span("reorg_check", self.contract_address):
+            await self.reset_unconfirmed_on_reorg(current_block)
+
+        new_unconfirmed_head_number = (
+            self.unconfirmed_head_number + self.sync_chunk_size
+        )
+        new_unconfirmed_head_number = min(new_unconfirmed_head_number, current_block)
+        new_confirmed_head_number = max(
+            new_unconfirmed_head_number - self.required_confirmations,
+            self.confirmed_head_number,
+        )
+
+        # return if blocks have already been processed
+        if (
+            self.confirmed_head_number >= new_confirmed_head_number
+            and self.unconfirmed_head_number >= new_unconfirmed_head_number
+        ):
+            return
+
+        self.last_pass_events = 0
+        run_confirmed_filters = (
+            self.confirmed_head_number < new_confirmed_head_number
+            and len(self.confirmed_callbacks) > 0
+        )
+        if run_confirmed_filters:
+            filters_confirmed = get_filter_params(
+                self.confirmed_head_number, new_confirmed_head_number
+            )
+            log.debug(
+                "Filtering for confirmed events: %s-%s @%d ...",
+                filters_confirmed["from_block"],
+                filters_confirmed["to_block"],
+                current_block,
+            )
+            self.last_pass_events += await self.filter_events(
+                filters_confirmed, self.confirmed_callbacks
+            )
+            log.debug("Finished.")
+
+        run_unconfirmed_filters = (
+            self.unconfirmed_head_number < new_unconfirmed_head_number
+            and len(self.unconfirmed_callbacks) > 0
+        )
+        if run_unconfirmed_filters:
+            filters_unconfirmed = get_filter_params(
+                self.unconfirmed_head_number, new_unconfirmed_head_number
+            )
+            log.debug(
+                "Filtering for unconfirmed events: %s-%s @%d ...",
+                filters_unconfirmed["from_block"],
+                filters_unconfirmed["to_block"],
+                current_block,
+            )
+            self.last_pass_events += await self.filter_events(
+                filters_unconfirmed, self.unconfirmed_callbacks
+            )
+            log.debug("Finished.")
+
+        # update head hash and number
+        try:
+            new_unconfirmed_block, new_confirmed_block = await asyncio.gather(
+                self.rpc.get_block(new_unconfirmed_head_number),
+                self.rpc.get_block(new_confirmed_head_number),
+            )
+            new_unconfirmed_head_hash = new_unconfirmed_block.hash
+            new_unconfirmed_head_timestamp = new_unconfirmed_block.timestamp
+            new_confirmed_head_hash = new_confirmed_block.hash
+        except AttributeError:
+            log.critical(
+                "RPC endpoint didn't return proper info for an existing block "
+                "(%d,%d)" % (new_unconfirmed_head_number, new_confirmed_head_number)
+            )
+            log.critical(
+                "It is possible that the blockchain isn't fully synced. "
+                "This often happens when Parity is run with --fast or --warp sync."
+            )
+            log.critical("Cannot continue - check status of the ethereum node.")
+            sys.exit(1)
+
+        self.unconfirmed_head_number = new_unconfirmed_head_number
+        self.unconfirmed_head_hash = new_unconfirmed_head_hash
+        self.confirmed_head_number = new_confirmed_head_number
+        self.confirmed_head_hash = new_confirmed_head_hash
+
+        if self.scheduler is not None:
+            self.scheduler.observe_head(
+                new_unconfirmed_head_number, new_unconfirmed_head_timestamp
+            )
+
+        # events below the confirmed head are never fetched again
+        self.deduplicator.prune(self.confirmed_head_number)
+        self._store_checkpoint()
+
+        if (
+            not self.wait_sync_event.is_set()
+            and new_unconfirmed_head_number == current_block
+        ):
+            self.wait_sync_event.set()
+
+    async def _fetch_events(self, topics: List, from_block: int, to_block: int):
+        async with self.fetch_semaphore:
+            # the number of windows depends on the range of the pass, so every
+            # request takes its share of the budget just before it is sent
+            if self.scheduler is not None:
+                await sleep_or_stop(self.stop_event, self.scheduler.catch_up_delay(1))
+
+            # concurrent fetches get a trace track each, so their spans don't overlap
+            track_number = heapq.heappop(self.free_fetch_tracks)
+            track = f"{self.contract_address}/fetch{track_number}"
+            try:
+                with tracer.span(
+                    "get_events", track, from_block=from_block, to_block=to_block
+                ):
+                    return await self.rpc.get_logs(
+                        {
+                            "fromBlock": from_block,
+                            "toBlock": to_block,
+                            "address": to_checksum_address(self.contract_address),
+                            "topics": topics,
+                        },
+                        track=track,
+                    )
+            finally:
+                heapq.heappush(self.free_fetch_tracks, track_number)
+
+    async def filter_events(self, filter_params: Dict, name_to_callback: Dict):
+        """ Filter events for given event names
+
+        The block range is split into `fetch_chunk_size` windows which are fetched
+        concurrently for every callback; callbacks still run in block order.
+
+        Params:
+            filter_params: arguments for the filter call
+            name_to_callback: dict that maps event name to callbacks executed
+                if the event is emmited
+
+        Returns:
+            The number of events passed to the callbacks
+        """
+        emitted = 0
+        block_ranges = split_block_range(
+            filter_params["from_block"],
+            filter_params["to_block"],
+            self.fetch_chunk_size,
+        )
+        callbacks = list(name_to_callback.items())
+        fetches = [
+            self._fetch_events(topics, from_block, to_block)
+            for _, (topics, _) in callbacks
+            for from_block, to_block in block_ranges
+        ]
+        results = await asyncio.gather(*fetches)
+
+        abi = self.contract_manager.get_contract_abi(self.contract_name)
+        for index, (callback_id, (_, callback)) in enumerate(callbacks):
+            offset = index * len(block_ranges)
+            for events in results[offset : offset + len(block_ranges)]:
+                for raw_event in events:
+                    if not self.deduplicator.is_new(
+                        callback_id,
+                        raw_event,
+                        keep_above_block=self.confirmed_head_number,
+                    ):
+                        continue
+                    with tracer.span("decode_event", self.contract_address):
+                        decoded_event = decode_event(abi, raw_event)
+                    log.debug("Received confirmed event: \n%s", decoded_event)
+                    with tracer.span("callback", self.contract_address):
+                        callback(decoded_event)
+                    emitted += 1
+
+        # persist the dedup index right away, so that a crash later in the pass
+        # re-emits at most the events of a single `filter_events` call
+        if emitted > 0:
+            self._store_checkpoint()
+        return emitted
+
+    def _store_checkpoint(self) -> None:
+        if self.checkpoint_path is not None:
+            store_checkpoint(self, self.checkpoint_path)
+
+    def _detected_chain_reorg(self, current_block: int):
+        log.debug(
+            "Chain reorganization detected. "
+            "Resyncing unconfirmed events (unconfirmed_head=%d) [@%d] "
+            "delta=%d block(s)",
+            self.unconfirmed_head_number,
+            current_block,
+            current_block - self.unconfirmed_head_number,
+        )
+        self.unconfirmed_head_number = self.confirmed_head_number
+        self.unconfirmed_head_hash = self.confirmed_head_hash
+
+    async def reset_unconfirmed_on_reorg(self, current_block: int):
+        """Test if chain reorganization happened (head number used in previous pass is greater than
+        current_block parameter) and in that case reset unconfirmed event list."""
+        if self.wait_sync_event.is_set():  # but not on first sync
+
+            # block number increased or stayed the same
+            if current_block >= self.unconfirmed_head_number:
+                # if the hash of our head changed, there was a chain reorg
+                unconfirmed_block = await self.rpc.get_block(
+                    self.unconfirmed_head_number
+                )
+                # a head the node doesn't know any more was reorganized as well
+                current_unconfirmed_hash = (
+                    unconfirmed_block.hash if unconfirmed_block is not None else None
+                )
+                if current_unconfirmed_hash != self.unconfirmed_head_hash:
+                    self._detected_chain_reorg(current_block)
+            # block number decreased, there was a chain reorg
+            elif current_block < self.unconfirmed_head_number:
+                self._detected_chain_reorg(current_block)
+
+            # now we have to check that the confirmed_head_hash stayed the same
+            # otherwise the program aborts
+            confirmed_block = await self.rpc.get_block(self.confirmed_head_number)
+            if confirmed_block is None:
+                log.critical(
+                    "Events considered confirmed have been reorganized. "
+                    "The block %d with hash %s does not exist any more.",
+                    self.confirmed_head_number,
+                    self.confirmed_head_hash,
+                )
+                sys.exit(
+                    1
+                )  # unreachable as long as confirmation level is set high enough
+            if confirmed_block.hash != self.confirmed_head_hash:
+                log.critical(
+                    "Events considered confirmed have been reorganized. "
+                    "Expected block hash %s for block number %d, but got block hash %s. "
+                    "The BlockchainListener's number of required confirmations is %d.",
+                    self.confirmed_head_hash,
+                    self.confirmed_head_number,
+                    confirmed_block.hash,
+                    self.required_confirmations,
+                )
+                sys.exit(
+                    1
+                )  # unreachable as long as confirmation level is set high enough
@@ -0,0 +1,207 @@
+"""asyncio flavour of the service logging raiden network events, free of gevent monkey-patching"""
+import asyncio
+import logging
+import sys
+import traceback
+from typing import Dict, List, Optional
+
+from eth_utils import is_checksum_address
+from raiden_libs.types import Address
+from raiden_contracts.contract_manager import ContractManager
+from raiden_contracts.constants import (
+    CONTRACT_TOKEN_NETWORK,
+    CONTRACT_TOKEN_NETWORK_REGISTRY,
+    CONTRACT_ENDPOINT_REGISTRY,
+    EVENT_TOKEN_NETWORK_CREATED,
+    EVENT_ADDRESS_REGISTERED,
+)
+
+# pylint: disable=E0401
+from poller_utils import handle_channel_event
+
+from .async_blockchain_listener import AsyncBlockchainListener
+from .async_rpc import AsyncRPCClient
+from .checkpoint import checkpoint_path, list_checkpoints
+from .poll_scheduler import PollScheduler
+from .events import create_registry_event_topics, create_channel_event_topics
+
+# pylint: disable=C0103
+log = logging.getLogger(__name__)
+
+
+def task_error_handler(task: asyncio.Future) -> None:
+    """Done callback printing the traceback of a crashed listener and exiting with a non-zero code"""
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is None:
+        return
+    log.fatal("Unhandled exception. Terminating the program...")
+    traceback.print_exception(type(exc), exc, exc.__traceback__)
+    sys.exit(1)
+
+
+# pylint: disable=R0902
+class AsyncMetricsService:
+    """Logs raiden network events polled from the ethereum blockchain using asyncio"""
+
+    # pylint: disable=R0913
+    def __init__(
+        self,
+        rpc: AsyncRPCClient,
+        contract_manager: ContractManager,
+        token_registry_address: Address,
+        endpoint_registry_address: Address,
+        sync_start_block: int = 0,
+        required_confirmations: int = 12,  # ~3min
+        state_dir: Optional[str] = None,
+        rpc_budget: Optional[float] = None,
+    ):
+        """Creates a new metrics service, must be called from within a running event loop"""
+        self.rpc = rpc
+        self.contract_manager = contract_manager
+        self.required_confirmations = required_confirmations
+        self.state_dir = state_dir
+        self.scheduler = PollScheduler(rpc_budget=rpc_budget)
+
+        self.is_running = asyncio.Event()
+        self.token_networks: List[str] = []
+        self.token_network_listeners: List[AsyncBlockchainListener] = []
+
+        self.token_network_registry_listener = AsyncBlockchainListener(
+            rpc=rpc,
+            contract_manager=contract_manager,
+            contract_name=CONTRACT_TOKEN_NETWORK_REGISTRY,
+            contract_address=token_registry_address,
+            sync_start_block=sync_start_block,
+            required_confirmations=self.required_confirmations,
+            scheduler=self.scheduler,
+            checkpoint_path=self._checkpoint_path(token_registry_address),
+        )
+
+        self.token_network_registry_listener.add_confirmed_listener(
+            create_registry_event_topics(
+                self.contract_manager,
+                CONTRACT_TOKEN_NETWORK_REGISTRY,
+                EVENT_TOKEN_NETWORK_CREATED,
+            ),
+            self.handle_token_network_created,
+        )
+
+        self.endpoint_registry_listener = AsyncBlockchainListener(
+            rpc=rpc,
+            contract_manager=contract_manager,
+            contract_name=CONTRACT_ENDPOINT_REGISTRY,
+            contract_address=endpoint_registry_address,
+            sync_start_block=sync_start_block,
+            required_confirmations=self.required_confirmations,
+            scheduler=self.scheduler,
+            checkpoint_path=self._checkpoint_path(endpoint_registry_address),
+        )
+
+        self.endpoint_registry_listener.add_confirmed_listener(
+            create_registry_event_topics(
+                self.contract_manager,
+                CONTRACT_ENDPOINT_REGISTRY,
+                EVENT_ADDRESS_REGISTERED,
+            ),
+            self.handle_endpoint_registered,
+        )
+
+        log.info(
+            f"Starting TokenNetworkRegistry Listener"
+            f" (required confirmations: {self.required_confirmations})...\n"
+            f"Listening to token network registry @ {token_registry_address}\n"
+            f"Listening to enpoint registry @ {endpoint_registry_address}\n"
+            f"Starting from block {sync_start_block}"
+        )
+
+    def _checkpoint_path(self, contract_address: Address) -> Optional[str]:
+        if self.state_dir is None:
+            return None
+        return checkpoint_path(self.state_dir, contract_address)
+
+    def _resume_token_networks(self) -> None:
+        """Recreates the token network listeners checkpointed by a previous run,
+        since their creation events lie below the resumed registry head"""
+        if self.state_dir is None:
+            return
+        for checkpoint in list_checkpoints(self.state_dir, CONTRACT_TOKEN_NETWORK):
+            self.create_token_network_for_address(checkpoint["contract_address"])
+
+    @property
+    def listeners(self) -> List[AsyncBlockchainListener]:
+        """All listeners owned by the service"""
+        return [
+            self.token_network_registry_listener,
+            self.endpoint_registry_listener,
+        ] + self.token_network_listeners
+
+    def _start_listener(self, listener: AsyncBlockchainListener) -> None:
+        listener.start().add_done_callback(task_error_handler)
+
+    async def run(self):
+        """Runs the service until `stop` is called, then waits for the listeners to finish"""
+        self._start_listener(self.token_network_registry_listener)
+        self._start_listener(self.endpoint_registry_listener)
+        self._resume_token_networks()
+
+        try:
+            await self.is_running.wait()
+        finally:
+            for listener in self.listeners:
+                listener.stop()
+            tasks = [listener.task for listener in self.listeners if listener.task]
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.rpc.close()
+
+    def stop(self) -> None:
+        """Stops the service"""
+        self.is_running.set()
+
+    # pylint: disable=R0201
+    def handle_endpoint_registered(self, event: Dict):
+        """Handles the EVENT_ADDRESS_REGISTERED event"""
+        eth_address: str = event["args"]["eth_address"]
+        endpoint: str = event["args"]["endpoint"]
+        log.info(f"New Node. eth_addr: {eth_address} ip_addr: {endpoint}")
+
+    def handle_token_network_created(self, event: Dict):
+        """Handles the EVENT_TOKEN_NETWORK_CREATED event"""
+        token_network_address = event["args"]["token_network_address"]
+        token_address = event["args"]["token_address"]
+        event_block_number = event["blockNumber"]
+
+        assert is_checksum_address(token_network_address)
+        assert is_checksum_address(token_address)
+
+        if token_network_address not in self.token_networks:
+            log.info(
+                f"New Token Network. token: {token_address} address: {token_network_address}"
+            )
+            self.create_token_network_for_address(
+                token_network_address, event_block_number
+            )
+
+    def create_token_network_for_address(
+        self, token_network_address: Address, block_number: int = 0
+    ):
+        """Creates and starts a listener for the given token network"""
+        token_network_listener = AsyncBlockchainListener(
+            rpc=self.rpc,
+            contract_manager=self.contract_manager,
+            contract_address=token_network_address,
+            contract_name=CONTRACT_TOKEN_NETWORK,
+            sync_start_block=block_number,
+            required_confirmations=self.required_confirmations,
+            scheduler=self.scheduler,
+            checkpoint_path=self._checkpoint_path(token_network_address),
+        )
+
+        # subscribe to event notifications from blockchain listener
+        token_network_listener.add_confirmed_listener(
+            create_channel_event_topics(), handle_channel_event
+        )
+        self._start_listener(token_network_listener)
+        self.token_network_listeners.append(token_network_listener)
+        self.token_networks.append(token_network_address)
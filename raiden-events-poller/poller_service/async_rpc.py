@@ -0,0 +1,183 @@
+"""Minimal asyncio JSON-RPC client exposing the subset of web3 used by the listeners."""
+import asyncio
+import itertools
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+from .profiling import NULL_SPAN, tracer
+
+log = logging.getLogger(__name__)
+
+LOG_QUANTITY_FIELDS = ("blockNumber", "logIndex", "transactionIndex")
+LOG_HASH_FIELDS = ("blockHash", "transactionHash")
+BLOCK_QUANTITY_FIELDS = ("number", "timestamp")
+BLOCK_HASH_FIELDS = ("hash", "parentHash")
+
+
+class RPCError(ValueError):
+    """Raised when the ethereum node answers a request with an error object"""
+
+
+def format_log_entry(raw_log: Dict) -> AttributeDict:
+    """Formats a raw `eth_getLogs` entry the same way web3's result formatters do"""
+    entry = dict(raw_log)
+    for field in LOG_QUANTITY_FIELDS:
+        if entry.get(field) is not None:
+            entry[field] = int(entry[field], 16)
+    for field in LOG_HASH_FIELDS:
+        if entry.get(field) is not None:
+            entry[field] = HexBytes(entry[field])
+    if entry.get("address") is not None:
+        entry["address"] = to_checksum_address(entry["address"])
+    entry["topics"] = [HexBytes(topic) for topic in entry.get("topics", [])]
+    return AttributeDict(entry)
+
+
+def format_block(raw_block: Optional[Dict]) -> Optional[AttributeDict]:
+    """Formats the header fields of a raw `eth_getBlockByNumber` result"""
+    if raw_block is None:
+        return None
+    block = dict(raw_block)
+    for field in BLOCK_QUANTITY_FIELDS:
+        if block.get(field) is not None:
+            block[field] = int(block[field], 16)
+    for field in BLOCK_HASH_FIELDS:
+        if block.get(field) is not None:
+            block[field] = HexBytes(block[field])
+    return AttributeDict(block)
+
+
+def trace_span(name: str, track: Optional[str], **args):
+    """Times a stage of a request on the caller's trace track, if it passed one"""
+    if track is None:
+        return NULL_SPAN
+    return tracer.span(name, track, **args)
+
+
+def to_quantity(value: Any) -> Any:
+    """Encodes block numbers as hex quantities, leaving tags like 'latest' untouched"""
+    if isinstance(value, int):
+        return hex(value)
+    return value
+
+
+class AsyncRPCClient:
+    """ An asyncio HTTP JSON-RPC client sharing one connection pool between requests. """
+
+    def __init__(
+        self,
+        endpoint_uri: str,
+        *,  # require all following arguments to be keyword arguments
+        request_timeout: int = 30,
+        max_connections: int = 16,
+        verify_ssl: bool = True,
+    ) -> None:
+        """Creates a new AsyncRPCClient
+
+        Args:
+            endpoint_uri: The HTTP URI of the ethereum node
+            request_timeout: Total timeout of a single request in seconds
+            max_connections: The maximum number of simultaneously open connections
+            verify_ssl: Whether to verify the TLS certificate of an https endpoint
+        """
+        self.endpoint_uri = endpoint_uri
+        self.request_timeout = request_timeout
+        self.max_connections = max_connections
+        self.verify_ssl = verify_ssl
+
+        self._request_ids = itertools.count()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The lazily created HTTP session, bound to the running event loop"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections, ssl=None if self.verify_ssl else False
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Closes the underlying HTTP session"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def make_request(
+        self, method: str, params: List, track: Optional[str] = None
+    ) -> Any:
+        """Sends a JSON-RPC request and returns its result
+
+        If a trace `track` is given, the network round trip and the JSON parsing
+        are recorded as separate "rpc_read" and "rpc_parse" spans on it.
+
+        Raises:
+            RPCError: if the node answered with an error object
+            aiohttp.ClientConnectionError: if the node could not be reached
+        """
+        payload = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": next(self._request_ids),
+        }
+        with trace_span("rpc_read", track, method=method):
+            async with self.session.post(self.endpoint_uri, json=payload) as response:
+                response.raise_for_status()
+                raw_body = await response.read()
+        with trace_span("rpc_parse", track, size=len(raw_body)):
+            body = json.loads(raw_body)
+
+        if "error" in body:
+            raise RPCError(body["error"])
+        return body["result"]
+
+    async def block_number(self) -> int:
+        """Returns the number of the most recent block"""
+        return int(await self.make_request("eth_blockNumber", []), 16)
+
+    async def get_block(self, block_identifier) -> Optional[AttributeDict]:
+        """Returns the header of a block, or None if the node doesn't know it"""
+        raw_block = await self.make_request(
+            "eth_getBlockByNumber", [to_quantity(block_identifier), False]
+        )
+        return format_block(raw_block)
+
+    async def get_logs(
+        self, filter_params: Dict, track: Optional[str] = None
+    ) -> List[AttributeDict]:
+        """Returns the logs matching the given web3-style filter params
+
+        Args:
+            filter_params: The `eth_getLogs` filter, block numbers may be ints
+            track: The trace track the stages of the request are recorded on, if any
+        """
+        params = dict(filter_params)
+        for key in ("fromBlock", "toBlock"):
+            if key in params:
+                params[key] = to_quantity(params[key])
+        raw_logs = await self.make_request("eth_getLogs", [params], track=track)
+        with trace_span("format_logs", track, count=len(raw_logs)):
+            return [format_log_entry(raw_log) for raw_log in raw_logs]
+
+
+async def sleep_or_stop(stop_event: asyncio.Event, delay: float) -> bool:
+    """Sleeps for `delay` seconds, waking up early if `stop_event` is set.
+
+    Returns:
+        True if the stop event was set
+    """
+    try:
+        await asyncio.wait_for(stop_event.wait(), timeout=delay)
+    except asyncio.TimeoutError:
+        return False
+    return True
@@ -1,96 +1,21 @@
 """Module containing the class 'BlockchainListener' and some helper methords."""
 import logging
 import sys
-from typing import Callable, Dict, Union, List, Tuple
+from typing import Callable, Dict, Optional, List, Tuple
 
 import requests
 from web3 import Web3
-from web3.contract import get_event_data
-from web3.utils.abi import filter_by_type
-from eth_utils import to_checksum_address, encode_hex, decode_hex
-from eth_utils.abi import event_abi_to_log_topic
 import gevent
 import gevent.event
 from raiden_contracts.contract_manager import ContractManager
 
-log = logging.getLogger(__name__)
-
+from .checkpoint import restore_checkpoint, store_checkpoint
+from .event_deduplicator import EventDeduplicator
+from .events import decode_event, get_events, get_filter_params
+from .poll_scheduler import PollScheduler
+from .profiling import tracer
 
-def create_channel_event_topics() -> List:
-    """Returns an empty list"""
-    return [None]  # event topic is any
-
-
-def create_registry_event_topics(
-    contract_manager: ContractManager, contract_name: str, event_name: str
-) -> List:
-    """Returns network ABI"""
-    new_network_abi = contract_manager.get_event_abi(contract_name, event_name)
-    return [encode_hex(event_abi_to_log_topic(new_network_abi))]
-
-
-# pylint: disable=W0621
-def decode_event(abi: Dict, log: Dict):
-    """ Helper function to unpack event data using a provided ABI
-
-    Args:
-        abi: The ABI of the contract, not the ABI of the event
-        log: The raw event data
-
-    Returns:
-        The decoded event
-    """
-    if isinstance(log["topics"][0], str):
-        log["topics"][0] = decode_hex(log["topics"][0])
-    elif isinstance(log["topics"][0], int):
-        log["topics"][0] = decode_hex(hex(log["topics"][0]))
-    event_id = log["topics"][0]
-    events = filter_by_type("event", abi)
-    topic_to_event_abi = {
-        event_abi_to_log_topic(event_abi): event_abi for event_abi in events
-    }
-    event_abi = topic_to_event_abi[event_id]
-    return get_event_data(event_abi, log)
-
-
-def get_events(
-    web3: Web3,
-    contract_address: str,
-    topics: List,
-    from_block: Union[int, str] = 0,
-    to_block: Union[int, str] = "latest",
-) -> List:
-    """Returns events emmitted by a contract for a given event name, within a certain range.
-
-    Args:
-        web3: A Web3 instance
-        contract_manager: A contract manager
-        contract_name: The name of the contract
-        contract_address: The address of the contract to be filtered, can be `None`
-        topics: The topics to filter for
-        from_block: The block to start search events
-        to_block: The block to stop searching for events
-
-    Returns:
-        All matching events
-    """
-    filter_params = {
-        "fromBlock": from_block,
-        "toBlock": to_block,
-        "address": to_checksum_address(contract_address),
-        "topics": topics,
-    }
-
-    return web3.eth.getLogs(filter_params)
-
-
-# filter for events after block_number
-# to_block is incremented because eth-tester doesn't include events from the end block
-# see https://github.com/raiden-network/raiden/pull/1321
-def get_filter_params(from_block: int, to_block: int) -> Dict[str, int]:
-    """Get corrected filter params"""
-    assert from_block <= to_block
-    return {"from_block": from_block + 1, "to_block": to_block + 1}
+log = logging.getLogger(__name__)
 
 
 # pylint: disable=R0902
@@ -108,6 +33,9 @@ class BlockchainListener(gevent.Greenlet):
         sync_chunk_size: int = 100_000,
         poll_interval: int = 15,
         sync_start_block: int = 0,
+        checkpoint_path: Optional[str] = None,
+        dedup_max_entries: int = 10000,
+        scheduler: Optional[PollScheduler] = None,
     ) -> None:
         """Creates a new BlockchainListener
 
@@ -117,8 +45,12 @@ class BlockchainListener(gevent.Greenlet):
             contract_name: The name of the contract
             required_confirmations: The number of confirmations required to call a block confirmed
             sync_chunk_size: The size of the chunks used during syncing
-            poll_interval: The interval used between polls
+            poll_interval: The interval used between polls if no scheduler is given
             sync_start_block: The block number syncing is started at
+            checkpoint_path: File the progress is persisted to and resumed from, if given
+            dedup_max_entries: The maximum number of event keys kept for deduplication
+            scheduler: A PollScheduler, possibly shared with other listeners, adapting
+                the interval between polls
         """
         super().__init__()
 
@@ -137,6 +69,8 @@ class BlockchainListener(gevent.Greenlet):
         self.sync_chunk_size = sync_chunk_size
         self.running = False
         self.poll_interval = poll_interval
+        self.scheduler = scheduler
+        self.last_pass_events: Optional[int] = None
 
         self.unconfirmed_head_number = sync_start_block
         self.confirmed_head_number = sync_start_block
@@ -145,6 +79,11 @@ class BlockchainListener(gevent.Greenlet):
 
         self.counter = 0
 
+        self.deduplicator = EventDeduplicator(dedup_max_entries)
+        self.checkpoint_path = checkpoint_path
+        if self.checkpoint_path is not None:
+            restore_checkpoint(self, self.checkpoint_path)
+
     def add_confirmed_listener(self, topics: List, callback: Callable):
         """ Add a callback to listen for confirmed events. """
         self.confirmed_callbacks[self.counter] = (topics, callback)
@@ -155,16 +94,34 @@ class BlockchainListener(gevent.Greenlet):
         self.unconfirmed_callbacks[self.counter] = (topics, callback)
         self.counter += 1
 
+    @property
+    def requests_per_pass(self) -> int:
+        """Rough number of RPC requests made by a single pass of `_update`"""
+        return 5 + len(self.confirmed_callbacks) + len(self.unconfirmed_callbacks)
+
+    def _next_poll_delay(self) -> float:
+        if self.scheduler is None:
+            return self.poll_interval
+        return self.scheduler.next_poll_delay(
+            self.contract_address,
+            self.unconfirmed_head_number,
+            self.last_pass_events,
+            self.requests_per_pass,
+        )
+
     # pylint: disable=E0202
     def _run(self):
         self.running = True
         log.info("Starting blockchain polling (interval %ss)", self.poll_interval)
         while self.running:
             try:
-                self._update()
+                with tracer.span("update", self.contract_address):
+                    self._update()
                 self.is_connected.set()
                 if self.wait_sync_event.is_set():
-                    gevent.sleep(self.poll_interval)
+                    gevent.sleep(self._next_poll_delay())
+                elif self.scheduler is not None:
+                    gevent.sleep(self.scheduler.catch_up_delay(self.requests_per_pass))
             except requests.exceptions.ConnectionError:
                 endpoint = self.web3.currentProvider.endpoint_uri
                 log.warning(
@@ -184,10 +141,12 @@ class BlockchainListener(gevent.Greenlet):
         self.wait_sync_event.wait()
 
     def _update(self):
+        self.last_pass_events = None
         current_block = self.web3.eth.blockNumber
 
         # reset unconfirmed channels in case of reorg
-        self.reset_unconfirmed_on_reorg(current_block)
+        with tracer.span("reorg_check", self.contract_address):
+            self.reset_unconfirmed_on_reorg(current_block)
 
         new_unconfirmed_head_number = (
             self.unconfirmed_head_number + self.sync_chunk_size
@@ -205,6 +164,7 @@ class BlockchainListener(gevent.Greenlet):
         ):
             return
 
+        self.last_pass_events = 0
         run_confirmed_filters = (
             self.confirmed_head_number < new_confirmed_head_number
             and len(self.confirmed_callbacks) > 0
@@ -221,7 +181,9 @@ class BlockchainListener(gevent.Greenlet):
                 current_block,
             )
             # filter the events and run callbacks
-            self.filter_events(filters_confirmed, self.confirmed_callbacks)
+            self.last_pass_events += self.filter_events(
+                filters_confirmed, self.confirmed_callbacks
+            )
             log.debug("Finished.")
 
         run_unconfirmed_filters = (
@@ -240,14 +202,16 @@ class BlockchainListener(gevent.Greenlet):
                 current_block,
             )
             # filter the events and run callbacks
-            self.filter_events(filters_unconfirmed, self.unconfirmed_callbacks)
+            self.last_pass_events += self.filter_events(
+                filters_unconfirmed, self.unconfirmed_callbacks
+            )
             log.debug("Finished.")
 
         # update head hash and number
         try:
-            new_unconfirmed_head_hash = self.web3.eth.getBlock(
-                new_unconfirmed_head_number
-            ).hash
+            new_unconfirmed_block = self.web3.eth.getBlock(new_unconfirmed_head_number)
+            new_unconfirmed_head_hash = new_unconfirmed_block.hash
+            new_unconfirmed_head_timestamp = new_unconfirmed_block.timestamp
             new_confirmed_head_hash = self.web3.eth.getBlock(
                 new_confirmed_head_number
             ).hash
@@ -268,6 +232,15 @@ class BlockchainListener(gevent.Greenlet):
         self.confirmed_head_number = new_confirmed_head_number
         self.confirmed_head_hash = new_confirmed_head_hash
 
+        if self.scheduler is not None:
+            self.scheduler.observe_head(
+                new_unconfirmed_head_number, new_unconfirmed_head_timestamp
+            )
+
+        # events below the confirmed head are never fetched again
+        self.deduplicator.prune(self.confirmed_head_number)
+        self._store_checkpoint()
+
         if (
             not self.wait_sync_event.is_set()
             and new_unconfirmed_head_number == current_block
@@ -281,22 +254,44 @@ class BlockchainListener(gevent.Greenlet):
             filter_params: arguments for the filter call
             name_to_callback: dict that maps event name to callbacks executed
                 if the event is emmited
+
+        Returns:
+            The number of events passed to the callbacks
         """
-        for _, (topics, callback) in name_to_callback.items():
-            events = get_events(
-                web3=self.web3,
-                contract_address=self.contract_address,
-                topics=topics,
-                **filter_params,
-            )
+        emitted = 0
+        for callback_id, (topics, callback) in name_to_callback.items():
+            with tracer.span("get_events", self.contract_address, **filter_params):
+                events = get_events(
+                    web3=self.web3,
+                    contract_address=self.contract_address,
+                    topics=topics,
+                    **filter_params,
+                )
 
             for raw_event in events:
-                decoded_event = decode_event(
-                    self.contract_manager.get_contract_abi(self.contract_name),
-                    raw_event,
-                )
+                if not self.deduplicator.is_new(
+                    callback_id, raw_event, keep_above_block=self.confirmed_head_number
+                ):
+                    continue
+                with tracer.span("decode_event", self.contract_address):
+                    decoded_event = decode_event(
+                        self.contract_manager.get_contract_abi(self.contract_name),
+                        raw_event,
+                    )
                 log.debug("Received confirmed event: \n%s", decoded_event)
-                callback(decoded_event)
+                with tracer.span("callback", self.contract_address):
+                    callback(decoded_event)
+                emitted += 1
+
+        # persist the dedup index right away, so that a crash later in the pass
+        # re-emits at most the events of a single `filter_events` call
+        if emitted > 0:
+            self._store_checkpoint()
+        return emitted
+
+    def _store_checkpoint(self) -> None:
+        if self.checkpoint_path is not None:
+            store_checkpoint(self, self.checkpoint_path)
 
     def _detected_chain_reorg(self, current_block: int):
         log.debug(
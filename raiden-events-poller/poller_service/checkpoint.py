@@ -0,0 +1,85 @@
+"""Persistence of listener progress, so that a restarted poller resumes where it stopped"""
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+from eth_utils import encode_hex, decode_hex
+
+log = logging.getLogger(__name__)
+
+
+def checkpoint_path(state_dir: str, contract_address: str) -> str:
+    """Returns the checkpoint file of the listener for the given contract"""
+    return os.path.join(state_dir, f"{contract_address}.json")
+
+
+def load_checkpoint(path: str) -> Optional[Dict]:
+    """Reads a checkpoint file, returns None if it doesn't exist yet"""
+    if not os.path.isfile(path):
+        return None
+    with open(path) as checkpoint_file:
+        return json.load(checkpoint_file)
+
+
+def list_checkpoints(state_dir: str, contract_name: str) -> List[Dict]:
+    """Returns all checkpoints in `state_dir` written by listeners of `contract_name`"""
+    if not os.path.isdir(state_dir):
+        return []
+
+    checkpoints = []
+    for file_name in sorted(os.listdir(state_dir)):
+        if not file_name.endswith(".json"):
+            continue
+        checkpoint = load_checkpoint(os.path.join(state_dir, file_name))
+        if checkpoint is not None and checkpoint["contract_name"] == contract_name:
+            checkpoints.append(checkpoint)
+    return checkpoints
+
+
+def store_checkpoint(listener, path: str) -> None:
+    """Atomically writes the confirmed head and the dedup index of a listener"""
+    checkpoint = {
+        "contract_name": listener.contract_name,
+        "contract_address": listener.contract_address,
+        "confirmed_head_number": listener.confirmed_head_number,
+        "confirmed_head_hash": (
+            encode_hex(listener.confirmed_head_hash)
+            if listener.confirmed_head_hash is not None
+            else None
+        ),
+        "emitted": listener.deduplicator.to_list(),
+    }
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(temp_path, path)
+
+
+def restore_checkpoint(listener, path: str) -> None:
+    """Resumes a listener from its checkpoint, if there is one.
+
+    Unconfirmed events are always refetched starting from the confirmed head;
+    the restored dedup index keeps them from being emitted twice. A listener without
+    a checkpoint gets one right away, so it is known on restart even before its first pass.
+    """
+    checkpoint = load_checkpoint(path)
+    if checkpoint is None:
+        store_checkpoint(listener, path)
+        return
+
+    confirmed_head_hash = checkpoint["confirmed_head_hash"]
+    if confirmed_head_hash is not None:
+        confirmed_head_hash = decode_hex(confirmed_head_hash)
+
+    listener.confirmed_head_number = checkpoint["confirmed_head_number"]
+    listener.confirmed_head_hash = confirmed_head_hash
+    listener.unconfirmed_head_number = listener.confirmed_head_number
+    listener.unconfirmed_head_hash = confirmed_head_hash
+    listener.deduplicator.load_list(checkpoint["emitted"])
+    log.info(
+        "Resuming %s @ %s from block %d",
+        listener.contract_name,
+        listener.contract_address,
+        listener.confirmed_head_number,
+    )
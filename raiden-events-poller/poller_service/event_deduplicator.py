@@ -0,0 +1,102 @@
+"""Bounded index of already emitted events, used to hand every event to a callback exactly once"""
+import hashlib
+import heapq
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from eth_utils import encode_hex, decode_hex
+
+KEY_DIGEST_SIZE = 16
+
+
+def event_key(callback_id: Hashable, event: Dict) -> bytes:
+    """Returns a compact digest of (callback, blockHash, transactionHash, logIndex)
+
+    The block hash is part of the key so that logs re-included in another block
+    after a reorg are emitted again, while plain re-fetches of the same block are not.
+    """
+    digest = hashlib.blake2b(digest_size=KEY_DIGEST_SIZE)
+    digest.update(str(callback_id).encode())
+    digest.update(bytes(event["blockHash"]))
+    digest.update(bytes(event["transactionHash"]))
+    digest.update(event["logIndex"].to_bytes(8, "big"))
+    return digest.digest()
+
+
+class EventDeduplicator:
+    """ Remembers the keys of emitted events, bounded by size and by the confirmed head.
+
+    When the index is full, the keys of the lowest blocks are evicted first. Keys of
+    blocks that may still be fetched again are never evicted, so a single pass
+    emitting more than `max_entries` events overshoots the bound until the next
+    `prune` instead of emitting events twice.
+    """
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        """Creates a new EventDeduplicator
+
+        Args:
+            max_entries: The number of keys kept once nothing can be fetched again
+        """
+        self.max_entries = max_entries
+        self.emitted: Dict[bytes, int] = {}
+        # (block number, key) of every key in `emitted`, possibly with stale entries
+        self.by_block: List[Tuple[int, bytes]] = []
+
+    def __len__(self) -> int:
+        return len(self.emitted)
+
+    def is_new(
+        self, callback_id: Hashable, event: Dict, keep_above_block: Optional[int] = None
+    ) -> bool:
+        """Records the event and returns True if it wasn't emitted to the callback before
+
+        Args:
+            callback_id: The callback the event is handed to
+            event: The raw event
+            keep_above_block: Keys of blocks above it are never evicted, usually
+                the confirmed head, from where events are fetched again
+        """
+        key = event_key(callback_id, event)
+        if key in self.emitted:
+            return False
+
+        self.emitted[key] = event["blockNumber"]
+        heapq.heappush(self.by_block, (event["blockNumber"], key))
+        self._evict(keep_above_block)
+        return True
+
+    def _evict(self, keep_above_block: Optional[int]) -> None:
+        while len(self.emitted) > self.max_entries and self.by_block:
+            block_number, key = self.by_block[0]
+            if keep_above_block is not None and block_number > keep_above_block:
+                break
+            heapq.heappop(self.by_block)
+            if self.emitted.get(key) == block_number:
+                del self.emitted[key]
+
+    def prune(self, below_block: int) -> None:
+        """Forgets events of blocks that can't be fetched again, i.e. below the confirmed head"""
+        self.emitted = {
+            key: block_number
+            for key, block_number in self.emitted.items()
+            if block_number >= below_block
+        }
+        self._index_blocks()
+
+    def _index_blocks(self) -> None:
+        self.by_block = [
+            (block_number, key) for key, block_number in self.emitted.items()
+        ]
+        heapq.heapify(self.by_block)
+
+    def to_list(self) -> List[Tuple[int, str]]:
+        """Serializes the index into a JSON compatible list"""
+        return [
+            (block_number, encode_hex(key))
+            for key, block_number in self.emitted.items()
+        ]
+
+    def load_list(self, entries: List[Tuple[int, str]]) -> None:
+        """Restores the index from the output of `to_list`"""
+        self.emitted = {decode_hex(key): block_number for block_number, key in entries}
+        self._index_blocks()
@@ -0,0 +1,312 @@
+"""One-shot backfill of raiden events into columnar Parquet/Arrow files"""
+import json
+import logging
+import os
+import re
+from typing import Dict, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from web3 import Web3
+from web3.utils.abi import filter_by_type
+from eth_abi import decode_abi, decode_single
+from eth_utils import encode_hex, to_checksum_address, to_bytes
+from eth_utils.abi import event_abi_to_log_topic
+from hexbytes import HexBytes
+from raiden_contracts.contract_manager import ContractManager
+from raiden_contracts.constants import (
+    CONTRACT_TOKEN_NETWORK,
+    CONTRACT_TOKEN_NETWORK_REGISTRY,
+    CONTRACT_ENDPOINT_REGISTRY,
+    EVENT_TOKEN_NETWORK_CREATED,
+)
+
+log = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ["parquet", "arrow"]
+PROGRESS_FILE = "_progress.json"
+BASE_COLUMNS = [
+    "block_number",
+    "block_hash",
+    "transaction_hash",
+    "log_index",
+    "address",
+]
+SMALL_INT_TYPE = re.compile(r"^u?int(8|16|32)$")
+
+
+def to_column_value(abi_type: str, value):
+    """Converts a decoded ABI value into a type arrow can store losslessly
+
+    Array types, fixed size or dynamic, become list columns of their converted items.
+    """
+    if abi_type.endswith("]"):
+        item_type = abi_type[: abi_type.rindex("[")]
+        return [to_column_value(item_type, item) for item in value]
+    if abi_type == "address":
+        return to_checksum_address(value)
+    if abi_type == "string" and isinstance(value, bytes):
+        # eth_abi 1.x returns strings undecoded
+        return value.decode("utf-8", errors="replace")
+    if abi_type.startswith(("uint", "int")) and not SMALL_INT_TYPE.match(abi_type):
+        # 256 bit integers don't fit any arrow integer type
+        return str(value)
+    return value
+
+
+def is_hashed_topic(abi_type: str) -> bool:
+    """Indexed dynamic values are only stored as their keccak hash in the topics"""
+    return abi_type in ("string", "bytes") or abi_type.endswith("]")
+
+
+class EventColumns:
+    """ Column-wise in-memory buffer for the logs of a single event type. """
+
+    def __init__(self, event_abi: Dict) -> None:
+        self.event_abi = event_abi
+        self.indexed_inputs = [arg for arg in event_abi["inputs"] if arg["indexed"]]
+        self.data_inputs = [arg for arg in event_abi["inputs"] if not arg["indexed"]]
+        self.data_types = [arg["type"] for arg in self.data_inputs]
+        arg_names = [arg["name"] for arg in event_abi["inputs"]]
+        self.columns: Dict[str, List] = {name: [] for name in BASE_COLUMNS + arg_names}
+
+    def __len__(self) -> int:
+        return len(self.columns["block_number"])
+
+    def append(self, raw_log: Dict) -> None:
+        """Decodes a raw log straight into the column lists"""
+        columns = self.columns
+        columns["block_number"].append(raw_log["blockNumber"])
+        columns["block_hash"].append(bytes(raw_log["blockHash"]))
+        columns["transaction_hash"].append(bytes(raw_log["transactionHash"]))
+        columns["log_index"].append(raw_log["logIndex"])
+        columns["address"].append(raw_log["address"])
+
+        for arg, topic in zip(self.indexed_inputs, raw_log["topics"][1:]):
+            if is_hashed_topic(arg["type"]):
+                value = bytes(topic)
+            else:
+                value = to_column_value(arg["type"], decode_single(arg["type"], topic))
+            columns[arg["name"]].append(value)
+
+        data = raw_log["data"]
+        if isinstance(data, str):
+            data = to_bytes(hexstr=data)
+        values = decode_abi(self.data_types, data)
+        for arg, value in zip(self.data_inputs, values):
+            columns[arg["name"]].append(to_column_value(arg["type"], value))
+
+    def to_table(self) -> pa.Table:
+        """Builds an arrow table out of the buffered columns"""
+        names = list(self.columns)
+        return pa.Table.from_arrays(
+            [pa.array(self.columns[name]) for name in names], names=names
+        )
+
+
+# pylint: disable=R0902
+class EventExporter:
+    """ Backfills all raiden events of a block range into partitioned columnar files.
+
+    The range is processed in partitions of `partition_size` blocks. For every
+    partition one file per event type is written to `<output_dir>/<event name>/`,
+    after which the partition is recorded in `_progress.json`; a restarted export
+    continues after the last recorded partition.
+    """
+
+    # pylint: disable=R0913
+    def __init__(
+        self,
+        web3: Web3,
+        contract_manager: ContractManager,
+        output_dir: str,
+        token_registry_address: str,
+        endpoint_registry_address: str,
+        *,  # require all following arguments to be keyword arguments
+        partition_size: int = 10000,
+        file_format: str = "parquet",
+    ) -> None:
+        """Creates a new EventExporter
+
+        Args:
+            web3: A Web3 instance
+            contract_manager: A contract manager
+            output_dir: The directory the files and the progress are written to
+            token_registry_address: Address of the token network registry
+            endpoint_registry_address: Address of the endpoint registry
+            partition_size: The number of blocks per partition
+            file_format: Either "parquet" or "arrow"
+        """
+        assert file_format in EXPORT_FORMATS
+        self.web3 = web3
+        self.output_dir = output_dir
+        self.token_registry_address = to_checksum_address(token_registry_address)
+        self.endpoint_registry_address = to_checksum_address(endpoint_registry_address)
+        self.partition_size = partition_size
+        self.file_format = file_format
+        self.token_networks: List[str] = []
+
+        self.topic_to_event_abi: Dict[str, Dict[bytes, Dict]] = {
+            contract_name: {
+                event_abi_to_log_topic(event_abi): event_abi
+                for event_abi in filter_by_type(
+                    "event", contract_manager.get_contract_abi(contract_name)
+                )
+            }
+            for contract_name in (
+                CONTRACT_TOKEN_NETWORK,
+                CONTRACT_TOKEN_NETWORK_REGISTRY,
+                CONTRACT_ENDPOINT_REGISTRY,
+            )
+        }
+
+    @property
+    def progress_path(self) -> str:
+        """The file recording the last completed partition"""
+        return os.path.join(self.output_dir, PROGRESS_FILE)
+
+    def _load_progress(self, from_block: int) -> int:
+        """Returns the first block still to be exported"""
+        if not os.path.isfile(self.progress_path):
+            if from_block > 0:
+                self._discover_token_networks(from_block - 1)
+            return from_block
+
+        with open(self.progress_path) as progress_file:
+            progress = json.load(progress_file)
+        self.token_networks = progress["token_networks"]
+        log.info(
+            "Resuming export after block %d (%d token networks known)",
+            progress["completed_block"],
+            len(self.token_networks),
+        )
+        return max(from_block, progress["completed_block"] + 1)
+
+    def _discover_token_networks(self, to_block: int) -> None:
+        """Finds the token networks created before the exported range
+
+        Only the `TokenNetworkCreated` logs of the registry are fetched, the other
+        events of these blocks are not part of the export.
+        """
+        created_abi = next(
+            event_abi
+            for event_abi in self.topic_to_event_abi[
+                CONTRACT_TOKEN_NETWORK_REGISTRY
+            ].values()
+            if event_abi["name"] == EVENT_TOKEN_NETWORK_CREATED
+        )
+        created = EventColumns(created_abi)
+        raw_logs = self.web3.eth.getLogs(
+            {
+                "fromBlock": 0,
+                "toBlock": to_block,
+                "address": self.token_registry_address,
+                "topics": [encode_hex(event_abi_to_log_topic(created_abi))],
+            }
+        )
+        for raw_log in raw_logs:
+            created.append(raw_log)
+        for address in created.columns["token_network_address"]:
+            if address not in self.token_networks:
+                self.token_networks.append(address)
+        log.info(
+            "Found %d token networks created before block %d",
+            len(self.token_networks),
+            to_block + 1,
+        )
+
+    def _store_progress(self, completed_block: int) -> None:
+        progress = {
+            "completed_block": completed_block,
+            "token_networks": self.token_networks,
+        }
+        temp_path = self.progress_path + ".tmp"
+        with open(temp_path, "w") as progress_file:
+            json.dump(progress, progress_file)
+        os.replace(temp_path, self.progress_path)
+
+    def _fetch_logs(self, addresses: List[str], from_block: int, to_block: int):
+        return self.web3.eth.getLogs(
+            {"fromBlock": from_block, "toBlock": to_block, "address": addresses}
+        )
+
+    def _buffer_logs(
+        self, buffers: Dict[str, EventColumns], contract_name: str, raw_logs: List
+    ) -> None:
+        topic_to_event_abi = self.topic_to_event_abi[contract_name]
+        for raw_log in raw_logs:
+            event_abi = topic_to_event_abi.get(bytes(HexBytes(raw_log["topics"][0])))
+            if event_abi is None:
+                log.warning("Skipping log with unknown topic: %s", raw_log)
+                continue
+            if event_abi["name"] not in buffers:
+                buffers[event_abi["name"]] = EventColumns(event_abi)
+            buffers[event_abi["name"]].append(raw_log)
+
+    def _write_table(
+        self, event_name: str, table: pa.Table, from_block: int, to_block: int
+    ):
+        event_dir = os.path.join(self.output_dir, event_name)
+        os.makedirs(event_dir, exist_ok=True)
+        path = os.path.join(
+            event_dir, f"{from_block:010d}-{to_block:010d}.{self.file_format}"
+        )
+
+        if self.file_format == "parquet":
+            pq.write_table(table, path)
+        else:
+            with pa.OSFile(path, "wb") as sink:
+                writer = pa.RecordBatchFileWriter(sink, table.schema)
+                writer.write_table(table)
+                writer.close()
+
+    def export_partition(self, from_block: int, to_block: int) -> int:
+        """Exports the events of the inclusive block range, returns the number of events"""
+        buffers: Dict[str, EventColumns] = {}
+
+        # registries first, so token networks created in this partition are included
+        self._buffer_logs(
+            buffers,
+            CONTRACT_TOKEN_NETWORK_REGISTRY,
+            self._fetch_logs([self.token_registry_address], from_block, to_block),
+        )
+        self._buffer_logs(
+            buffers,
+            CONTRACT_ENDPOINT_REGISTRY,
+            self._fetch_logs([self.endpoint_registry_address], from_block, to_block),
+        )
+        if EVENT_TOKEN_NETWORK_CREATED in buffers:
+            created = buffers[EVENT_TOKEN_NETWORK_CREATED].columns
+            for address in created["token_network_address"]:
+                if address not in self.token_networks:
+                    self.token_networks.append(address)
+
+        if self.token_networks:
+            self._buffer_logs(
+                buffers,
+                CONTRACT_TOKEN_NETWORK,
+                self._fetch_logs(self.token_networks, from_block, to_block),
+            )
+
+        for event_name, columns in buffers.items():
+            self._write_table(event_name, columns.to_table(), from_block, to_block)
+
+        return sum(len(columns) for columns in buffers.values())
+
+    def run(self, from_block: int, to_block: int) -> None:
+        """Exports the inclusive block range, resuming a previous run into the same directory"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        start_block = self._load_progress(from_block)
+
+        for partition_start in range(start_block, to_block + 1, self.partition_size):
+            partition_end = min(partition_start + self.partition_size - 1, to_block)
+            event_count = self.export_partition(partition_start, partition_end)
+            self._store_progress(partition_end)
+            log.info(
+                "Exported blocks %d-%d (%d events)",
+                partition_start,
+                partition_end,
+                event_count,
+            )
+
+        log.info("Export finished at block %d", to_block)
@@ -0,0 +1,85 @@
+"""Helpers filtering and decoding contract events, shared by the gevent and the asyncio listeners"""
+from typing import Dict, List, Union
+
+from web3 import Web3
+from web3.contract import get_event_data
+from web3.utils.abi import filter_by_type
+from eth_utils import to_checksum_address, encode_hex, decode_hex
+from eth_utils.abi import event_abi_to_log_topic
+from raiden_contracts.contract_manager import ContractManager
+
+
+def create_channel_event_topics() -> List:
+    """Returns an empty list"""
+    return [None]  # event topic is any
+
+
+def create_registry_event_topics(
+    contract_manager: ContractManager, contract_name: str, event_name: str
+) -> List:
+    """Returns network ABI"""
+    new_network_abi = contract_manager.get_event_abi(contract_name, event_name)
+    return [encode_hex(event_abi_to_log_topic(new_network_abi))]
+
+
+def decode_event(abi: Dict, log: Dict):
+    """ Helper function to unpack event data using a provided ABI
+
+    Args:
+        abi: The ABI of the contract, not the ABI of the event
+        log: The raw event data
+
+    Returns:
+        The decoded event
+    """
+    if isinstance(log["topics"][0], str):
+        log["topics"][0] = decode_hex(log["topics"][0])
+    elif isinstance(log["topics"][0], int):
+        log["topics"][0] = decode_hex(hex(log["topics"][0]))
+    event_id = log["topics"][0]
+    events = filter_by_type("event", abi)
+    topic_to_event_abi = {
+        event_abi_to_log_topic(event_abi): event_abi for event_abi in events
+    }
+    event_abi = topic_to_event_abi[event_id]
+    return get_event_data(event_abi, log)
+
+
+def get_events(
+    web3: Web3,
+    contract_address: str,
+    topics: List,
+    from_block: Union[int, str] = 0,
+    to_block: Union[int, str] = "latest",
+) -> List:
+    """Returns events emmitted by a contract for a given event name, within a certain range.
+
+    Args:
+        web3: A Web3 instance
+        contract_manager: A contract manager
+        contract_name: The name of the contract
+        contract_address: The address of the contract to be filtered, can be `None`
+        topics: The topics to filter for
+        from_block: The block to start search events
+        to_block: The block to stop searching for events
+
+    Returns:
+        All matching events
+    """
+    filter_params = {
+        "fromBlock": from_block,
+        "toBlock": to_block,
+        "address": to_checksum_address(contract_address),
+        "topics": topics,
+    }
+
+    return web3.eth.getLogs(filter_params)
+
+
+# filter for events after block_number
+# to_block is incremented because eth-tester doesn't include events from the end block
+# see https://github.com/raiden-network/raiden/pull/1321
+def get_filter_params(from_block: int, to_block: int) -> Dict[str, int]:
+    """Get corrected filter params"""
+    assert from_block <= to_block
+    return {"from_block": from_block + 1, "to_block": to_block + 1}
@@ -0,0 +1,139 @@
+"""Adaptive poll scheduling shared by all listeners of a service"""
+import bisect
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class PollScheduler:
+    """ Decides how long a listener sleeps before its next poll.
+
+    The block time is estimated from the head timestamps reported by the listeners,
+    and polls are aligned to just after the next block is expected. Listeners that
+    saw no events back off exponentially (in blocks), and all delays are stretched
+    so that the whole service stays within a global RPC budget.
+
+    The scheduler only computes delays and never sleeps itself, so it can be shared
+    by the gevent and the asyncio listeners alike.
+    """
+
+    def __init__(
+        self,
+        *,  # require all following arguments to be keyword arguments
+        rpc_budget: Optional[float] = None,
+        initial_block_time: float = 15.0,
+        max_backoff_blocks: int = 32,
+        poll_margin: float = 1.0,
+        smoothing: float = 0.2,
+    ) -> None:
+        """Creates a new PollScheduler
+
+        Args:
+            rpc_budget: Maximum number of RPC requests per second, unlimited if None
+            initial_block_time: The block time assumed before any head was observed
+            max_backoff_blocks: Upper bound of the poll interval of dormant listeners, in blocks
+            poll_margin: Seconds to wait after the expected block time before polling
+            smoothing: Weight of a new sample in the block time moving average
+        """
+        self.rpc_budget = rpc_budget
+        self.block_time = initial_block_time
+        self.max_backoff_blocks = max_backoff_blocks
+        self.poll_margin = poll_margin
+        self.smoothing = smoothing
+
+        self.head_number: Optional[int] = None
+        self.head_timestamp: Optional[int] = None
+        self.backoff_blocks: Dict[str, int] = {}
+        self.reservations: List[Tuple[float, float]] = []
+
+    def observe_head(self, block_number: int, timestamp: int) -> None:
+        """Updates the block time estimate with a newly seen head"""
+        if self.head_number is not None and block_number <= self.head_number:
+            return
+
+        if self.head_number is not None and self.head_timestamp is not None:
+            sample = (timestamp - self.head_timestamp) / (
+                block_number - self.head_number
+            )
+            if sample > 0:
+                self.block_time += self.smoothing * (sample - self.block_time)
+
+        self.head_number = block_number
+        self.head_timestamp = timestamp
+
+    def _reserve(self, cost: int, at_time: float) -> float:
+        """Reserves `cost` requests of the budget no earlier than `at_time`,
+        returns the time the requests may be sent at"""
+        if self.rpc_budget is None:
+            return at_time
+
+        duration = cost / self.rpc_budget
+        now = time.time()
+        self.reservations = [
+            (start, end) for start, end in self.reservations if end > now
+        ]
+
+        start = at_time
+        for reserved_start, reserved_end in self.reservations:
+            if start + duration <= reserved_start:
+                break
+            start = max(start, reserved_end)
+        bisect.insort(self.reservations, (start, start + duration))
+        return start
+
+    def _late_block_poll_time(self, expected_time: float, now: float) -> float:
+        """Returns the time to check again for a block expected at `expected_time`
+
+        The retries back off geometrically from the expected time: half a block time
+        after it, then one, two, four block times and so on, rather than polling a
+        stalled or slow chain every `poll_margin` seconds. The wait is capped at the
+        interval of a dormant listener, so that a head far in the past, e.g. of a
+        lagging node or because of clock skew, doesn't stop the polling.
+        """
+        delay = max(self.block_time / 2, self.poll_margin)
+        while expected_time + delay <= now:
+            delay *= 2
+        max_delay = self.max_backoff_blocks * self.block_time
+        return min(expected_time + delay, now + max_delay)
+
+    def catch_up_delay(self, cost: int) -> float:
+        """Returns the delay of a listener that is still syncing, bounded only by the budget"""
+        now = time.time()
+        return self._reserve(cost, now) - now
+
+    def next_poll_delay(
+        self, listener_key: str, head_number: int, new_events: Optional[int], cost: int
+    ) -> float:
+        """Returns the delay before the next poll of a synced listener
+
+        Args:
+            listener_key: Identifies the listener, e.g. its contract address
+            head_number: The unconfirmed head the listener has processed
+            new_events: Events emitted by the last pass, None if it found no new blocks
+            cost: The number of RPC requests a pass of the listener makes
+        """
+        backoff = self.backoff_blocks.get(listener_key, 1)
+        if new_events:
+            backoff = 1
+        elif new_events is not None:
+            backoff = min(backoff * 2, self.max_backoff_blocks)
+        self.backoff_blocks[listener_key] = backoff
+
+        now = time.time()
+        if self.head_number is None or self.head_timestamp is None:
+            poll_time = now + backoff * self.block_time
+        else:
+            # the block the listener wants to see next, relative to the newest known head
+            blocks_ahead = head_number + backoff - self.head_number
+            if blocks_ahead <= 0:
+                # another listener already saw it
+                poll_time = now
+            else:
+                poll_time = (
+                    self.head_timestamp
+                    + blocks_ahead * self.block_time
+                    + self.poll_margin
+                )
+                if poll_time < now:
+                    poll_time = self._late_block_poll_time(poll_time, now)
+
+        return self._reserve(cost, poll_time) - now
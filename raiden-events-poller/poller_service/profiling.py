@@ -0,0 +1,194 @@
+"""Built-in instrumentation: per-stage timing spans and a sampling profiler.
+
+Both work the same under gevent and asyncio, since neither relies on threads:
+spans are measured inline and the profiler samples the interrupted stack from a
+SIGPROF handler. Both stop themselves once their window has elapsed and write
+their file, or at interpreter exit if the window wasn't over yet.
+"""
+import atexit
+import json
+import logging
+import os
+import signal
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+
+class _NullSpan:
+    """Context manager doing nothing, returned while tracing is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer: "Tracer", name: str, track: str, args: Dict) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.track = track
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(
+            self.name, self.track, self.start, time.perf_counter(), self.args
+        )
+        return False
+
+
+class Tracer:
+    """ Records timing spans of the hot path, exported in Chrome trace format. """
+
+    def __init__(self, max_spans: int = 1_000_000) -> None:
+        """Creates a new, disabled Tracer
+
+        Args:
+            max_spans: The number of spans kept, the oldest spans are dropped first
+        """
+        self.enabled = False
+        self.path: Optional[str] = None
+        self.deadline = 0.0
+        self.origin = time.perf_counter()
+        self.spans: Deque = deque(maxlen=max_spans)
+        self.tracks: Dict[str, int] = {}
+
+    def enable(self, path: str, duration: float) -> None:
+        """Starts recording spans for `duration` seconds, then writes them to `path`"""
+        self.path = path
+        self.origin = time.perf_counter()
+        self.deadline = self.origin + duration
+        self.enabled = True
+        atexit.register(self.stop)
+        log.info("Tracing hot path stages for %ds into %s", duration, path)
+
+    def span(self, name: str, track: str = "main", **args):
+        """Returns a context manager timing the enclosed block as stage `name`
+
+        Args:
+            name: The stage, e.g. "get_events"
+            track: Groups spans into one row of the trace, e.g. a contract address
+            args: Additional details shown with the span
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, track, args)
+
+    def record(
+        self, name: str, track: str, start: float, end: float, args: Dict
+    ) -> None:
+        """Stores a finished span, stopping the tracer once its window has elapsed"""
+        if not self.enabled:
+            return
+        if track not in self.tracks:
+            self.tracks[track] = len(self.tracks)
+        self.spans.append((name, self.tracks[track], start, end, args))
+        if end >= self.deadline:
+            self.stop()
+
+    def to_chrome_trace(self) -> Dict:
+        """Converts the recorded spans into the Chrome trace event format"""
+        pid = os.getpid()
+        events = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": track},
+            }
+            for track, tid in self.tracks.items()
+        ]
+        events.extend(
+            {
+                "name": name,
+                "ph": "X",
+                "pid": pid,
+                "tid": tid,
+                "ts": (start - self.origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "args": args,
+            }
+            for name, tid, start, end, args in self.spans
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def stop(self) -> None:
+        """Stops recording and writes the trace file"""
+        if not self.enabled:
+            return
+        self.enabled = False
+        assert self.path is not None
+        with open(self.path, "w") as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file, default=str)
+        log.info("Wrote %d spans to %s", len(self.spans), self.path)
+
+
+class SamplingProfiler:
+    """ Samples the Python stack on CPU time ticks and writes collapsed stacks.
+
+    The output has one `frame;frame;frame count` line per distinct stack and can
+    be rendered with flamegraph.pl or speedscope. Only available on Unix.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        """Creates a new SamplingProfiler
+
+        Args:
+            interval: The CPU time between two samples in seconds
+        """
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.running = False
+        self.path: Optional[str] = None
+        self.deadline = 0.0
+
+    def start(self, path: str, duration: float) -> None:
+        """Samples for `duration` seconds of wall time, then writes the profile to `path`"""
+        self.path = path
+        self.deadline = time.time() + duration
+        self.running = True
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        atexit.register(self.stop)
+        log.info("Sampling profile for %ds into %s", duration, path)
+
+    def _sample(self, _signum, frame) -> None:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+            frame = frame.f_back
+        self.samples[";".join(reversed(stack))] += 1
+
+        if time.time() >= self.deadline:
+            self.stop()
+
+    def stop(self) -> None:
+        """Stops sampling and writes the collapsed stacks"""
+        if not self.running:
+            return
+        self.running = False
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        assert self.path is not None
+        with open(self.path, "w") as profile_file:
+            for stack, count in self.samples.most_common():
+                profile_file.write(f"{stack} {count}\n")
+        log.info("Wrote %d samples to %s", sum(self.samples.values()), self.path)
+
+
+# pylint: disable=C0103
+tracer = Tracer()
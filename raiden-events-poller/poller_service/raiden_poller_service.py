@@ -2,7 +2,7 @@
 import logging
 import sys
 import traceback
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import gevent
 
@@ -20,13 +20,12 @@ from raiden_contracts.constants import (
 )
 
 # pylint: disable=E0401
-from poller_utils import get_specific_event_info
+from poller_utils import handle_channel_event
 
-from .blockchain_listener import (
-    BlockchainListener,
-    create_registry_event_topics,
-    create_channel_event_topics,
-)
+from .checkpoint import checkpoint_path, list_checkpoints
+from .poll_scheduler import PollScheduler
+from .blockchain_listener import BlockchainListener
+from .events import create_registry_event_topics, create_channel_event_topics
 
 # pylint: disable=C0103
 log = logging.getLogger(__name__)
@@ -39,21 +38,6 @@ def error_handler(_, exc_info):
     sys.exit()
 
 
-def handle_channel_event(event: Dict) -> None:
-    """Handles all channel events specified in raiden_contracts.constants.ChannelEvents"""
-    event_name = event["event"]
-    token_address = event["address"]
-    channel_identifier = event["args"]["channel_identifier"]
-
-    log_entry = (
-        f"evt: {event_name} " f"net: {token_address} " f"ch: {channel_identifier}"
-    )
-
-    log_entry += get_specific_event_info(event)
-
-    log.info(log_entry)
-
-
 # pylint: disable=R0902
 class MetricsService(gevent.Greenlet):
     """Logs raiden network events polled from the ethereum blockchain"""
@@ -67,12 +51,16 @@ class MetricsService(gevent.Greenlet):
         endpoint_registry_address: Address,
         sync_start_block: int = 0,
         required_confirmations: int = 12,  # ~3min
+        state_dir: Optional[str] = None,
+        rpc_budget: Optional[float] = None,
     ):
         """Creates a new pathfinding service"""
         super().__init__()
         self.web3 = web3
         self.contract_manager = contract_manager
         self.required_confirmations = required_confirmations
+        self.state_dir = state_dir
+        self.scheduler = PollScheduler(rpc_budget=rpc_budget)
 
         self.is_running = gevent.event.Event()
         self.token_networks: List[str] = []
@@ -85,6 +73,8 @@ class MetricsService(gevent.Greenlet):
             contract_address=token_registry_address,
             sync_start_block=sync_start_block,
             required_confirmations=self.required_confirmations,
+            scheduler=self.scheduler,
+            checkpoint_path=self._checkpoint_path(token_registry_address),
         )
 
         self.token_network_registry_listener.add_confirmed_listener(
@@ -103,6 +93,8 @@ class MetricsService(gevent.Greenlet):
             contract_address=endpoint_registry_address,
             sync_start_block=sync_start_block,
             required_confirmations=self.required_confirmations,
+            scheduler=self.scheduler,
+            checkpoint_path=self._checkpoint_path(endpoint_registry_address),
         )
 
         self.endpoint_registry_listener.add_confirmed_listener(
@@ -122,6 +114,19 @@ class MetricsService(gevent.Greenlet):
             f"Starting from block {sync_start_block}"
         )
 
+    def _checkpoint_path(self, contract_address: Address) -> Optional[str]:
+        if self.state_dir is None:
+            return None
+        return checkpoint_path(self.state_dir, contract_address)
+
+    def _resume_token_networks(self) -> None:
+        """Recreates the token network listeners checkpointed by a previous run,
+        since their creation events lie below the resumed registry head"""
+        if self.state_dir is None:
+            return
+        for checkpoint in list_checkpoints(self.state_dir, CONTRACT_TOKEN_NETWORK):
+            self.create_token_network_for_address(checkpoint["contract_address"])
+
     # pylint: disable=E0202
     def _run(self):
         register_error_handler(error_handler)
@@ -131,6 +136,8 @@ class MetricsService(gevent.Greenlet):
         if self.endpoint_registry_listener is not None:
             self.endpoint_registry_listener.start()
 
+        self._resume_token_networks()
+
         self.is_running.wait()
 
     def stop(self) -> None:
@@ -172,6 +179,8 @@ class MetricsService(gevent.Greenlet):
             contract_name=CONTRACT_TOKEN_NETWORK,
             sync_start_block=block_number,
             required_confirmations=self.required_confirmations,
+            scheduler=self.scheduler,
+            checkpoint_path=self._checkpoint_path(token_network_address),
         )
 
         # subscribe to event notifications from blockchain listener
@@ -180,3 +189,4 @@ class MetricsService(gevent.Greenlet):
         )
         token_network_listener.start()
         self.token_network_listeners.append(token_network_listener)
+        self.token_networks.append(token_network_address)
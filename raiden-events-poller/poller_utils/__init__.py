@@ -1,5 +1,7 @@
 from .channel_event_switcher import get_specific_event_info
+from .channel_event_logger import handle_channel_event
 
 __all__ = [
-    "get_specific_event_info"
-]
\ No newline at end of file
+    "get_specific_event_info",
+    "handle_channel_event"
+]
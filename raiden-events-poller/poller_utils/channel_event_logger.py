@@ -0,0 +1,22 @@
+"""Logging of channel events, shared by the gevent and the asyncio services"""
+import logging
+from typing import Dict
+
+from .channel_event_switcher import get_specific_event_info
+
+log = logging.getLogger(__name__)
+
+
+def handle_channel_event(event: Dict) -> None:
+    """Handles all channel events specified in raiden_contracts.constants.ChannelEvents"""
+    event_name = event["event"]
+    token_address = event["address"]
+    channel_identifier = event["args"]["channel_identifier"]
+
+    log_entry = (
+        f"evt: {event_name} " f"net: {token_address} " f"ch: {channel_identifier}"
+    )
+
+    log_entry += get_specific_event_info(event)
+
+    log.info(log_entry)
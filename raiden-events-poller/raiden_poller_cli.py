@@ -1,11 +1,30 @@
 """Command Line Tool to listen for raiden network events"""
+import asyncio
 import logging
+import os
 import sys
+from typing import List
 
-from gevent import monkey, config
+ENGINES = ["gevent", "asyncio"]
+ENGINE_ENVVAR = "POLLER_ENGINE"
 
-config.resolver = ["dnspython", "ares", "block"]
-monkey.patch_all()
+
+def requested_engine(argv: List[str]) -> str:
+    """Peeks at the --engine option before click parses it, since gevent has to
+    monkey-patch the standard library before anything else is imported"""
+    for index, arg in enumerate(argv):
+        if arg.startswith("--engine="):
+            return arg.split("=", 1)[1]
+        if arg == "--engine" and index + 1 < len(argv):
+            return argv[index + 1]
+    return os.environ.get(ENGINE_ENVVAR, "gevent")
+
+
+if requested_engine(sys.argv[1:]) == "gevent":
+    from gevent import monkey, config
+
+    config.resolver = ["dnspython", "ares", "block"]
+    monkey.patch_all()
 
 import click
 
@@ -27,7 +46,9 @@ from raiden_contracts.constants import (
     CONTRACT_ENDPOINT_REGISTRY,
 )
 
-from poller_service import MetricsService
+from poller_service import MetricsService, AsyncMetricsService
+from poller_service.async_rpc import AsyncRPCClient
+from poller_service.profiling import SamplingProfiler, tracer
 
 DEFAULT_PORT = 9999
 OUTPUT_FILE = "network-info.json"
@@ -64,6 +85,61 @@ REQUIRED_CONFIRMATIONS = 8  # ~2min with 15s blocks
     type=int,
     help="Number of block confirmations to wait for",
 )
+@click.option(
+    "--engine",
+    default="gevent",
+    type=click.Choice(ENGINES),
+    envvar=ENGINE_ENVVAR,
+    help="Concurrency engine used by the listeners",
+)
+@click.option(
+    "--state-dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Directory the listener checkpoints are kept in, enables resuming",
+)
+@click.option(
+    "--rpc-budget",
+    default=None,
+    type=float,
+    help="Maximum number of RPC requests per second shared by all listeners",
+)
+@click.option(
+    "--export-dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Backfill the events into columnar files in this directory and exit",
+)
+@click.option(
+    "--export-format",
+    default="parquet",
+    type=click.Choice(["parquet", "arrow"]),
+    help="File format of the exported events",
+)
+@click.option(
+    "--end-block",
+    default=None,
+    type=int,
+    help="Last block to export, defaults to the latest confirmed block",
+)
+@click.option(
+    "--trace",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Write per-stage timing spans of the profiling window as a Chrome trace",
+)
+@click.option(
+    "--profile",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Write a sampling profile (collapsed stacks) of the profiling window",
+)
+@click.option(
+    "--profile-duration",
+    default=300,
+    type=int,
+    help="Length of the profiling window in seconds, starting at launch",
+)
 # @click.option(
 #     "--latest",
 #     default=True,
@@ -76,6 +152,15 @@ def main(
     endpoint_registry_address,
     start_block,
     confirmations,
+    engine,
+    state_dir,
+    rpc_budget,
+    export_dir,
+    export_format,
+    end_block,
+    trace,
+    profile,
+    profile_duration,
     # latest,
 ):
     """Main command"""
@@ -90,6 +175,13 @@ def main(
     logging.getLogger("urllib3.connectionpool").setLevel(logging.ERROR)
 
     log.info("Starting Raiden Metrics Server")
+    if trace is not None:
+        tracer.enable(trace, profile_duration)
+    if profile is not None:
+        SamplingProfiler().start(profile, profile_duration)
+    if state_dir is not None:
+        os.makedirs(state_dir, exist_ok=True)
+
     try:
         log.info(f"Starting Web3 client for node at {eth_rpc}")
         web3 = Web3(HTTPProvider(eth_rpc))
@@ -141,22 +233,72 @@ def main(
                 )
                 sys.exit(1)
 
-        token_service = MetricsService(
-            web3=web3,
-            contract_manager=ContractManager(
-                contracts_precompiled_path(version="pre_limits")
-            ),
-            token_registry_address=token_registry_address,
-            endpoint_registry_address=endpoint_registry_address,
-            sync_start_block=start_block,
-            required_confirmations=confirmations,
+        contract_manager = ContractManager(
+            contracts_precompiled_path(version="pre_limits")
         )
 
-        token_service.run()
+        if export_dir is not None:
+            # pyarrow is an optional dependency only needed for exporting
+            try:
+                # pylint: disable=C0415
+                from poller_service.event_exporter import EventExporter
+            except ImportError as ex:
+                log.error(ex)
+                log.error(
+                    "Exporting requires pyarrow, install the poller with the "
+                    "`export` extra (poetry install -E export)"
+                )
+                sys.exit(1)
+
+            if end_block is None:
+                end_block = web3.eth.blockNumber - confirmations
+
+            EventExporter(
+                web3=web3,
+                contract_manager=contract_manager,
+                output_dir=export_dir,
+                token_registry_address=token_registry_address,
+                endpoint_registry_address=endpoint_registry_address,
+                file_format=export_format,
+            ).run(from_block=start_block, to_block=end_block)
+        elif engine == "asyncio":
+            asyncio.run(
+                run_async_service(
+                    eth_rpc=eth_rpc,
+                    contract_manager=contract_manager,
+                    token_registry_address=token_registry_address,
+                    endpoint_registry_address=endpoint_registry_address,
+                    sync_start_block=start_block,
+                    required_confirmations=confirmations,
+                    state_dir=state_dir,
+                    rpc_budget=rpc_budget,
+                )
+            )
+        else:
+            token_service = MetricsService(
+                web3=web3,
+                contract_manager=contract_manager,
+                token_registry_address=token_registry_address,
+                endpoint_registry_address=endpoint_registry_address,
+                sync_start_block=start_block,
+                required_confirmations=confirmations,
+                state_dir=state_dir,
+                rpc_budget=rpc_budget,
+            )
+
+            token_service.run()
 
     sys.exit(0)
 
 
+async def run_async_service(eth_rpc: str, **service_kwargs) -> None:
+    """Builds the asyncio service inside the running loop and runs it"""
+    # no_ssl_verification only patches requests, aiohttp is told explicitly
+    rpc = AsyncRPCClient(eth_rpc, verify_ssl=False)
+    token_service = AsyncMetricsService(rpc=rpc, **service_kwargs)
+    await token_service.run()
+
+
 if __name__ == "__main__":
     # pylint: disable=E1120
     main()
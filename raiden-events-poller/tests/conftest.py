@@ -0,0 +1,35 @@
+"""Fixtures shared by the poller tests"""
+import threading
+
+import pytest
+from raiden_contracts.contract_manager import (
+    ContractManager,
+    contracts_precompiled_path,
+)
+
+from fake_chain import FakeChain, ThreadingHTTPServer, make_handler
+
+
+@pytest.fixture
+def fake_chain_factory():
+    """Returns a function starting a FakeChain behind a local HTTP JSON-RPC endpoint"""
+    servers = []
+
+    def factory(length: int = 0) -> FakeChain:
+        chain = FakeChain(length)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(chain))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        chain.endpoint_uri = f"http://127.0.0.1:{server.server_address[1]}"
+        servers.append(server)
+        return chain
+
+    yield factory
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope="session")
+def contract_manager():
+    return ContractManager(contracts_precompiled_path(version="pre_limits"))
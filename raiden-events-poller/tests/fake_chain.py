@@ -0,0 +1,176 @@
+"""Fake ethereum JSON-RPC node shared by the listener and exporter tests"""
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Dict, List, Optional
+
+from eth_abi import encode_abi, encode_single
+from eth_utils import encode_hex, event_abi_to_log_topic, to_checksum_address
+
+TOKEN_NETWORK_ADDRESS = to_checksum_address("0x" + "ab" * 20)
+TOKEN_NETWORK_REGISTRY_ADDRESS = to_checksum_address("0x" + "cd" * 20)
+ENDPOINT_REGISTRY_ADDRESS = to_checksum_address("0x" + "ef" * 20)
+GENESIS_TIMESTAMP = 1_540_000_000
+
+
+def block_hash(number: int, fork: int) -> str:
+    """Deterministic block hash, changing whenever the block is reorganized"""
+    return encode_hex(hashlib.sha256(f"{number}-{fork}".encode()).digest())
+
+
+def parse_block_number(value, latest: int) -> int:
+    if value in ("latest", "pending"):
+        return latest
+    if value == "earliest":
+        return 0
+    if isinstance(value, int):
+        return value
+    return int(value, 16)
+
+
+# pylint: disable=R0902
+class FakeChain:
+    """ A scripted chain answering the JSON-RPC calls made by the listeners.
+
+    Logs are returned the way a real node does: hex quantities, lowercase addresses.
+    """
+
+    def __init__(self, length: int = 0, block_time: int = 15) -> None:
+        self.block_time = block_time
+        self.blocks: List[Dict] = []
+        self.logs: List[Dict] = []
+        self.requests: List[Dict] = []
+        self.fork = 0
+        self.lock = threading.Lock()
+        self.mine(length + 1)  # genesis plus `length` blocks
+
+    @property
+    def head(self) -> int:
+        return len(self.blocks) - 1
+
+    def mine(self, count: int = 1) -> None:
+        """Appends `count` empty blocks"""
+        for _ in range(count):
+            number = len(self.blocks)
+            self.blocks.append(
+                {
+                    "number": hex(number),
+                    "hash": block_hash(number, self.fork),
+                    "parentHash": (
+                        self.blocks[-1]["hash"] if self.blocks else "0x" + "00" * 32
+                    ),
+                    "timestamp": hex(GENESIS_TIMESTAMP + number * self.block_time),
+                }
+            )
+
+    def add_event(
+        self, block_number: int, address: str, event_abi: Dict, **args
+    ) -> None:
+        """Adds a log of the given event ABI to an existing block"""
+        indexed = [arg for arg in event_abi["inputs"] if arg["indexed"]]
+        not_indexed = [arg for arg in event_abi["inputs"] if not arg["indexed"]]
+        topics = [encode_hex(event_abi_to_log_topic(event_abi))] + [
+            encode_hex(encode_single(arg["type"], args[arg["name"]])) for arg in indexed
+        ]
+        data = encode_abi(
+            [arg["type"] for arg in not_indexed],
+            [args[arg["name"]] for arg in not_indexed],
+        )
+        log_index = len(
+            [log for log in self.logs if int(log["blockNumber"], 16) == block_number]
+        )
+        self.logs.append(
+            {
+                "address": address.lower(),
+                "topics": topics,
+                "data": encode_hex(data),
+                "blockNumber": hex(block_number),
+                "blockHash": self.blocks[block_number]["hash"],
+                "transactionHash": encode_hex(
+                    hashlib.sha256(
+                        f"{block_number}-{log_index}-{self.fork}".encode()
+                    ).digest()
+                ),
+                "transactionIndex": hex(log_index),
+                "logIndex": hex(log_index),
+                "removed": False,
+            }
+        )
+
+    def reorg(self, from_block: int, new_head: Optional[int] = None) -> None:
+        """Replaces all blocks from `from_block` on, dropping their logs"""
+        self.fork += 1
+        self.blocks = self.blocks[:from_block]
+        self.logs = [
+            log for log in self.logs if int(log["blockNumber"], 16) < from_block
+        ]
+        self.mine((new_head if new_head is not None else from_block - 1) - self.head)
+
+    def get_logs(self, params: Dict) -> List[Dict]:
+        from_block = parse_block_number(params.get("fromBlock", "latest"), self.head)
+        to_block = parse_block_number(params.get("toBlock", "latest"), self.head)
+        addresses = params.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        if addresses is not None:
+            addresses = [address.lower() for address in addresses]
+        topics = params.get("topics") or []
+        first_topic = topics[0] if topics else None
+
+        return [
+            log
+            for log in self.logs
+            if from_block <= int(log["blockNumber"], 16) <= to_block
+            and (addresses is None or log["address"] in addresses)
+            and (first_topic is None or log["topics"][0] == first_topic)
+        ]
+
+    def handle(self, method: str, params: List):
+        with self.lock:
+            self.requests.append({"method": method, "params": params})
+            if method == "eth_blockNumber":
+                return hex(self.head)
+            if method == "eth_getBlockByNumber":
+                number = parse_block_number(params[0], self.head)
+                return self.blocks[number] if number <= self.head else None
+            if method == "eth_getLogs":
+                return self.get_logs(params[0])
+            if method == "net_version":
+                return "1"
+            raise ValueError(f"Unsupported method {method}")
+
+    def count_requests(self, method: str) -> int:
+        return len(
+            [request for request in self.requests if request["method"] == method]
+        )
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def make_handler(chain: FakeChain):
+    class JSONRPCHandler(BaseHTTPRequestHandler):
+        def do_POST(self):  # pylint: disable=C0103
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            try:
+                response = {
+                    "result": chain.handle(request["method"], request["params"])
+                }
+            except ValueError as ex:
+                response = {"error": {"code": -32601, "message": str(ex)}}
+            response.update({"jsonrpc": "2.0", "id": request["id"]})
+
+            body = json.dumps(response).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # pylint: disable=W0221
+            pass
+
+    return JSONRPCHandler
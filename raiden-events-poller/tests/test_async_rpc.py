@@ -0,0 +1,41 @@
+"""The asyncio engine on its own: no gevent, explicit TLS settings"""
+import asyncio
+import os
+import subprocess
+import sys
+
+from poller_service.async_rpc import AsyncRPCClient
+
+
+def test_async_service_does_not_import_gevent():
+    code = (
+        "import sys\n"
+        "from poller_service import AsyncMetricsService\n"
+        "assert 'gevent' not in sys.modules, 'gevent was imported'\n"
+    )
+    # a fresh interpreter, the test session itself imported gevent already
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=package_dir)
+
+
+def test_verify_ssl_configures_the_connector():
+    async def connector_ssl(rpc: AsyncRPCClient):
+        try:
+            return rpc.session.connector._ssl  # pylint: disable=W0212
+        finally:
+            await rpc.close()
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert (
+            loop.run_until_complete(
+                connector_ssl(AsyncRPCClient("https://node", verify_ssl=False))
+            )
+            is False
+        )
+        assert (
+            loop.run_until_complete(connector_ssl(AsyncRPCClient("https://node")))
+            is not False
+        )
+    finally:
+        loop.close()
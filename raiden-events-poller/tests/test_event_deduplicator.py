@@ -0,0 +1,215 @@
+"""Deduplication of emitted events and resuming listeners from their checkpoint"""
+import pytest
+from hexbytes import HexBytes
+
+from poller_service.events import create_channel_event_topics
+from poller_service.checkpoint import checkpoint_path, load_checkpoint
+from poller_service.event_deduplicator import EventDeduplicator
+
+from fake_chain import TOKEN_NETWORK_ADDRESS
+from test_listener_parity import ENGINES, normalize, populate
+
+
+def make_event(block_number: int, log_index: int = 0, fork: int = 0) -> dict:
+    return {
+        "blockNumber": block_number,
+        "blockHash": HexBytes(bytes([fork, block_number % 256]) * 16),
+        "transactionHash": HexBytes(bytes([block_number % 256, log_index]) * 16),
+        "logIndex": log_index,
+    }
+
+
+def test_is_new_per_callback_and_block_hash():
+    deduplicator = EventDeduplicator()
+    event = make_event(10)
+
+    assert deduplicator.is_new(0, event)
+    assert not deduplicator.is_new(0, event)
+    # every callback receives the event once
+    assert deduplicator.is_new(1, event)
+    # the same log re-included in another block after a reorg is new
+    assert deduplicator.is_new(0, make_event(10, fork=1))
+    assert len(deduplicator) == 3
+
+
+def test_max_entries_evicts_lowest_blocks():
+    deduplicator = EventDeduplicator(max_entries=2)
+    for block_number in (3, 1, 2):
+        deduplicator.is_new(0, make_event(block_number))
+
+    assert sorted(deduplicator.emitted.values()) == [2, 3]
+    assert deduplicator.is_new(0, make_event(1))
+    assert not deduplicator.is_new(0, make_event(3))
+
+
+def test_keys_above_the_confirmed_head_are_never_evicted():
+    deduplicator = EventDeduplicator(max_entries=2)
+    for block_number in (9, 10, 11, 12):
+        deduplicator.is_new(0, make_event(block_number), keep_above_block=9)
+
+    # the bound is exceeded until the confirmed head moves on
+    assert sorted(deduplicator.emitted.values()) == [10, 11, 12]
+    deduplicator.prune(below_block=11)
+    assert sorted(deduplicator.emitted.values()) == [11, 12]
+    assert not deduplicator.is_new(0, make_event(12))
+
+
+def test_prune_scans_unordered_entries():
+    deduplicator = EventDeduplicator()
+    # unconfirmed events of young blocks are emitted before older confirmed ones
+    for block_number in (58, 59, 20, 30, 60, 40):
+        deduplicator.is_new(0, make_event(block_number))
+
+    deduplicator.prune(below_block=50)
+
+    assert sorted(deduplicator.emitted.values()) == [58, 59, 60]
+
+
+def test_list_roundtrip():
+    deduplicator = EventDeduplicator()
+    for block_number in (5, 3, 7):
+        deduplicator.is_new(0, make_event(block_number))
+
+    restored = EventDeduplicator()
+    restored.load_list(deduplicator.to_list())
+
+    assert restored.emitted == deduplicator.emitted
+    assert not restored.is_new(0, make_event(3))
+
+
+def start_engine(engine_class, chain, contract_manager, path, received, fail_from=None):
+    """Starts a listener on `path`, recording the keys of the events it emits"""
+    engine = engine_class(
+        chain,
+        contract_manager=contract_manager,
+        required_confirmations=4,
+        sync_chunk_size=25,
+        checkpoint_path=path,
+    )
+
+    def record(kind):
+        def callback(event):
+            if fail_from is not None and kind == "unconfirmed":
+                if event["blockNumber"] >= fail_from:
+                    raise RuntimeError("poller crashed")
+            event = normalize(event)
+            received[kind].append((event["blockHash"], event["logIndex"]))
+
+        return callback
+
+    engine.listener.add_confirmed_listener(
+        create_channel_event_topics(), record("confirmed")
+    )
+    engine.listener.add_unconfirmed_listener(
+        create_channel_event_topics(), record("unconfirmed")
+    )
+    return engine
+
+
+def update_until_synced(chain, engine) -> None:
+    for _ in range(10):
+        engine.update()
+        if engine.listener.unconfirmed_head_number == chain.head:
+            break
+
+
+@pytest.mark.parametrize("engine_class", ENGINES)
+def test_checkpoint_restore_emits_every_event_once(
+    engine_class, fake_chain_factory, contract_manager, tmp_path
+):
+    chain = fake_chain_factory(60)
+    populate(chain, contract_manager, 60)
+    path = checkpoint_path(str(tmp_path), TOKEN_NETWORK_ADDRESS)
+
+    first_run = {"confirmed": [], "unconfirmed": []}
+    engine = start_engine(engine_class, chain, contract_manager, path, first_run)
+    try:
+        update_until_synced(chain, engine)
+    finally:
+        engine.close()
+    assert load_checkpoint(path)["confirmed_head_number"] == 56
+
+    # the node moved on while the poller was down
+    chain.mine(5)
+    populate(chain, contract_manager, 65, from_block=61)
+
+    second_run = {"confirmed": [], "unconfirmed": []}
+    engine = start_engine(engine_class, chain, contract_manager, path, second_run)
+    try:
+        assert engine.listener.confirmed_head_number == 56
+        update_until_synced(chain, engine)
+    finally:
+        engine.close()
+
+    all_logs = [
+        (HexBytes(log["blockHash"]), int(log["logIndex"], 16)) for log in chain.logs
+    ]
+    for kind in ("confirmed", "unconfirmed"):
+        assert not set(first_run[kind]) & set(second_run[kind])
+        assert len(second_run[kind]) == len(set(second_run[kind]))
+    assert sorted(first_run["unconfirmed"] + second_run["unconfirmed"]) == sorted(
+        all_logs
+    )
+
+
+@pytest.mark.parametrize("engine_class", ENGINES)
+def test_checkpoint_is_stored_during_the_pass(
+    engine_class, fake_chain_factory, contract_manager, tmp_path
+):
+    chain = fake_chain_factory(60)
+    populate(chain, contract_manager, 60)
+    path = checkpoint_path(str(tmp_path), TOKEN_NETWORK_ADDRESS)
+
+    first_run = {"confirmed": [], "unconfirmed": []}
+    engine = start_engine(engine_class, chain, contract_manager, path, first_run)
+    try:
+        update_until_synced(chain, engine)
+    finally:
+        engine.close()
+
+    # the unconfirmed callbacks crash after the confirmed ones of the pass ran
+    chain.mine(10)
+    populate(chain, contract_manager, 70, from_block=61)
+    crashed_run = {"confirmed": [], "unconfirmed": []}
+    engine = start_engine(
+        engine_class, chain, contract_manager, path, crashed_run, fail_from=61
+    )
+    try:
+        with pytest.raises(RuntimeError):
+            update_until_synced(chain, engine)
+    finally:
+        engine.close()
+    assert crashed_run["confirmed"]
+
+    restarted_run = {"confirmed": [], "unconfirmed": []}
+    engine = start_engine(engine_class, chain, contract_manager, path, restarted_run)
+    try:
+        update_until_synced(chain, engine)
+    finally:
+        engine.close()
+
+    assert not set(crashed_run["confirmed"]) & set(restarted_run["confirmed"])
+    assert restarted_run["unconfirmed"]
+
+
+@pytest.mark.parametrize("engine_class", ENGINES)
+def test_small_index_keeps_keys_that_can_be_fetched_again(
+    engine_class, fake_chain_factory, contract_manager
+):
+    chain = fake_chain_factory(60)
+    populate(chain, contract_manager, 60)
+    received = {"confirmed": [], "unconfirmed": []}
+    engine = start_engine(engine_class, chain, contract_manager, None, received)
+    engine.listener.deduplicator.max_entries = 20
+    try:
+        # a single pass emits far more events than the index holds
+        update_until_synced(chain, engine)
+        chain.mine(10)
+        populate(chain, contract_manager, 70, from_block=61)
+        update_until_synced(chain, engine)
+    finally:
+        engine.close()
+
+    for kind in ("confirmed", "unconfirmed"):
+        assert len(received[kind]) == len(set(received[kind]))
+    assert len(received["unconfirmed"]) == len(chain.logs)
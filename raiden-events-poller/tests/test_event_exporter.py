@@ -0,0 +1,181 @@
+"""Columnar export of historical events"""
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from web3 import HTTPProvider, Web3
+from raiden_contracts.constants import (
+    CONTRACT_ENDPOINT_REGISTRY,
+    CONTRACT_TOKEN_NETWORK_REGISTRY,
+)
+
+from poller_service.event_exporter import EventExporter, to_column_value
+
+from fake_chain import (
+    ENDPOINT_REGISTRY_ADDRESS,
+    TOKEN_NETWORK_ADDRESS,
+    TOKEN_NETWORK_REGISTRY_ADDRESS,
+)
+from test_listener_parity import populate
+
+TOKEN_ADDRESS = Web3.toChecksumAddress("0x" + "12" * 20)
+
+
+def test_array_values_become_lists():
+    assert to_column_value("uint256[]", (1, 2 ** 255)) == ["1", str(2 ** 255)]
+    assert to_column_value("uint8[2]", (1, 2)) == [1, 2]
+    assert to_column_value("address[]", ("0x" + "ab" * 20,)) == [TOKEN_NETWORK_ADDRESS]
+    assert to_column_value("uint32[][]", ((1,), ())) == [[1], []]
+
+    column = pa.array([to_column_value("uint256[]", (1, 2)), []])
+    assert column.type == pa.list_(pa.string())
+
+
+def read_table(path: str) -> pa.Table:
+    if path.endswith(".arrow"):
+        with pa.OSFile(path, "rb") as source:
+            return pa.RecordBatchFileReader(source).read_all()
+    return pq.read_table(path)
+
+
+def read_rows(export_dir: str, event_name: str):
+    event_dir = os.path.join(export_dir, event_name)
+    rows = []
+    for file_name in sorted(os.listdir(event_dir)):
+        columns = read_table(os.path.join(event_dir, file_name)).to_pydict()
+        rows.extend(dict(zip(columns, values)) for values in zip(*columns.values()))
+    return rows
+
+
+def make_exporter(
+    chain, contract_manager, export_dir: str, file_format: str = "parquet"
+) -> EventExporter:
+    return EventExporter(
+        web3=Web3(HTTPProvider(chain.endpoint_uri)),
+        contract_manager=contract_manager,
+        output_dir=export_dir,
+        token_registry_address=TOKEN_NETWORK_REGISTRY_ADDRESS,
+        endpoint_registry_address=ENDPOINT_REGISTRY_ADDRESS,
+        partition_size=10,
+        file_format=file_format,
+    )
+
+
+def create_token_network(chain, contract_manager, block_number: int) -> None:
+    chain.add_event(
+        block_number,
+        TOKEN_NETWORK_REGISTRY_ADDRESS,
+        contract_manager.get_event_abi(
+            CONTRACT_TOKEN_NETWORK_REGISTRY, "TokenNetworkCreated"
+        ),
+        token_address=TOKEN_ADDRESS,
+        token_network_address=TOKEN_NETWORK_ADDRESS,
+    )
+
+
+def test_export_resumes_after_last_partition(
+    fake_chain_factory, contract_manager, tmp_path
+):
+    chain = fake_chain_factory(50)
+    create_token_network(chain, contract_manager, 3)
+    chain.add_event(
+        4,
+        ENDPOINT_REGISTRY_ADDRESS,
+        contract_manager.get_event_abi(CONTRACT_ENDPOINT_REGISTRY, "AddressRegistered"),
+        eth_address=TOKEN_ADDRESS,
+        endpoint="127.0.0.1:5001",
+    )
+    populate(chain, contract_manager, 50, from_block=4)
+    export_dir = str(tmp_path)
+
+    make_exporter(chain, contract_manager, export_dir).run(from_block=0, to_block=25)
+    with open(os.path.join(export_dir, "_progress.json")) as progress_file:
+        progress = json.load(progress_file)
+    assert progress == {
+        "completed_block": 25,
+        "token_networks": [TOKEN_NETWORK_ADDRESS],
+    }
+
+    # a restarted export only fetches the blocks after the last partition
+    requests_before = len(chain.requests)
+    make_exporter(chain, contract_manager, export_dir).run(from_block=0, to_block=45)
+    resumed_from = [
+        int(request["params"][0]["fromBlock"], 16)
+        for request in chain.requests[requests_before:]
+        if request["method"] == "eth_getLogs"
+    ]
+    assert min(resumed_from) == 26
+
+    assert sorted(os.listdir(os.path.join(export_dir, "ChannelOpened"))) == [
+        "0000000000-0000000009.parquet",
+        "0000000010-0000000019.parquet",
+        "0000000020-0000000025.parquet",
+        "0000000026-0000000035.parquet",
+        "0000000036-0000000045.parquet",
+    ]
+    opened = read_rows(export_dir, "ChannelOpened")
+    expected_blocks = [
+        block_number for block_number in range(4, 46) if block_number % 3 != 0
+    ]
+    assert [row["block_number"] for row in opened] == expected_blocks
+    assert opened[0]["participant1"] == Web3.toChecksumAddress("0x" + "aa" * 20)
+
+    deposits = read_rows(export_dir, "ChannelNewDeposit")
+    assert [row["total_deposit"] for row in deposits[:1]] == [str(10 ** 20 + 5)]
+
+    (created,) = read_rows(export_dir, "TokenNetworkCreated")
+    assert created["token_network_address"] == TOKEN_NETWORK_ADDRESS
+    (registered,) = read_rows(export_dir, "AddressRegistered")
+    assert registered["endpoint"] == "127.0.0.1:5001"
+
+
+def test_arrow_export(fake_chain_factory, contract_manager, tmp_path):
+    chain = fake_chain_factory(20)
+    create_token_network(chain, contract_manager, 3)
+    populate(chain, contract_manager, 20, from_block=4)
+    export_dir = str(tmp_path)
+
+    make_exporter(chain, contract_manager, export_dir, file_format="arrow").run(
+        from_block=0, to_block=15
+    )
+
+    assert sorted(os.listdir(os.path.join(export_dir, "ChannelOpened"))) == [
+        "0000000000-0000000009.arrow",
+        "0000000010-0000000015.arrow",
+    ]
+    opened = read_rows(export_dir, "ChannelOpened")
+    assert [row["block_number"] for row in opened] == [
+        block_number for block_number in range(4, 16) if block_number % 3 != 0
+    ]
+    (created,) = read_rows(export_dir, "TokenNetworkCreated")
+    assert created["token_network_address"] == TOKEN_NETWORK_ADDRESS
+
+
+def test_export_starting_after_token_network_creation(
+    fake_chain_factory, contract_manager, tmp_path
+):
+    chain = fake_chain_factory(40)
+    create_token_network(chain, contract_manager, 3)
+    populate(chain, contract_manager, 40, from_block=4)
+    export_dir = str(tmp_path)
+
+    make_exporter(chain, contract_manager, export_dir).run(from_block=20, to_block=35)
+
+    # the registry is searched for the creation event only
+    (discovery,) = [
+        request["params"][0]
+        for request in chain.requests
+        if request["method"] == "eth_getLogs"
+        and int(request["params"][0]["fromBlock"], 16) == 0
+    ]
+    assert int(discovery["toBlock"], 16) == 19
+    assert len(discovery["topics"]) == 1
+
+    opened = read_rows(export_dir, "ChannelOpened")
+    assert [row["block_number"] for row in opened] == [
+        block_number for block_number in range(20, 36) if block_number % 3 != 0
+    ]
+    assert not os.path.exists(os.path.join(export_dir, "TokenNetworkCreated"))
+    with open(os.path.join(export_dir, "_progress.json")) as progress_file:
+        assert json.load(progress_file)["token_networks"] == [TOKEN_NETWORK_ADDRESS]
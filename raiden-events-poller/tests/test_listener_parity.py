@@ -0,0 +1,206 @@
+"""The gevent and the asyncio listener must hand the same events to their callbacks"""
+import asyncio
+
+import pytest
+from web3 import HTTPProvider, Web3
+from raiden_contracts.constants import CONTRACT_TOKEN_NETWORK
+
+from poller_service.async_blockchain_listener import AsyncBlockchainListener
+from poller_service.async_rpc import AsyncRPCClient
+from poller_service.blockchain_listener import BlockchainListener
+from poller_service.events import create_channel_event_topics
+
+from fake_chain import TOKEN_NETWORK_ADDRESS
+
+PARTICIPANT1 = "0x" + "aa" * 20
+PARTICIPANT2 = "0x" + "bb" * 20
+
+
+def normalize(event) -> dict:
+    """Turns a decoded event into plain comparable values"""
+    return {
+        key: dict(value) if key == "args" else value for key, value in event.items()
+    }
+
+
+class GeventEngine:
+    """Drives a BlockchainListener pass by pass"""
+
+    def __init__(self, chain, **kwargs) -> None:
+        self.listener = BlockchainListener(
+            web3=Web3(HTTPProvider(chain.endpoint_uri)),
+            contract_manager=kwargs.pop("contract_manager"),
+            contract_name=CONTRACT_TOKEN_NETWORK,
+            contract_address=TOKEN_NETWORK_ADDRESS,
+            **kwargs,
+        )
+
+    def update(self) -> None:
+        self.listener._update()  # pylint: disable=W0212
+
+    def close(self) -> None:
+        pass
+
+
+class AsyncEngine:
+    """Drives an AsyncBlockchainListener pass by pass on a private event loop"""
+
+    def __init__(self, chain, **kwargs) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.rpc = AsyncRPCClient(chain.endpoint_uri)
+        self.listener = AsyncBlockchainListener(
+            rpc=self.rpc,
+            contract_manager=kwargs.pop("contract_manager"),
+            contract_name=CONTRACT_TOKEN_NETWORK,
+            contract_address=TOKEN_NETWORK_ADDRESS,
+            fetch_chunk_size=7,
+            **kwargs,
+        )
+
+    def update(self) -> None:
+        self.loop.run_until_complete(self.listener._update())  # pylint: disable=W0212
+
+    def close(self) -> None:
+        self.loop.run_until_complete(self.rpc.close())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+
+ENGINES = [GeventEngine, AsyncEngine]
+
+
+def populate(chain, contract_manager, up_to_block: int, from_block: int = 1) -> None:
+    """Adds channel events to most blocks, two of them to every fifth block"""
+    abi = contract_manager.get_event_abi(CONTRACT_TOKEN_NETWORK, "ChannelOpened")
+    deposit_abi = contract_manager.get_event_abi(
+        CONTRACT_TOKEN_NETWORK, "ChannelNewDeposit"
+    )
+    for block_number in range(from_block, up_to_block + 1):
+        if block_number % 3 == 0:
+            continue
+        chain.add_event(
+            block_number,
+            TOKEN_NETWORK_ADDRESS,
+            abi,
+            channel_identifier=block_number,
+            participant1=PARTICIPANT1,
+            participant2=PARTICIPANT2,
+            settle_timeout=500,
+        )
+        if block_number % 5 == 0:
+            chain.add_event(
+                block_number,
+                TOKEN_NETWORK_ADDRESS,
+                deposit_abi,
+                channel_identifier=block_number,
+                participant=PARTICIPANT1,
+                total_deposit=10 ** 20 + block_number,
+            )
+
+
+def run_scenario(engine_class, fake_chain_factory, contract_manager, script):
+    """Runs `script(chain, engine)` and returns the events the callbacks received"""
+    chain = fake_chain_factory(60)
+    populate(chain, contract_manager, 60)
+    engine = engine_class(
+        chain,
+        contract_manager=contract_manager,
+        required_confirmations=4,
+        sync_chunk_size=25,
+    )
+    received = {"confirmed": [], "unconfirmed": []}
+    engine.listener.add_confirmed_listener(
+        create_channel_event_topics(),
+        lambda event: received["confirmed"].append(normalize(event)),
+    )
+    engine.listener.add_unconfirmed_listener(
+        create_channel_event_topics(),
+        lambda event: received["unconfirmed"].append(normalize(event)),
+    )
+    try:
+        script(chain, engine)
+    finally:
+        engine.close()
+    return received, chain
+
+
+def sync(chain, engine) -> None:
+    for _ in range(10):
+        engine.update()
+        if engine.listener.wait_sync_event.is_set():
+            break
+    assert engine.listener.unconfirmed_head_number == chain.head
+
+
+def run_both(fake_chain_factory, contract_manager, script):
+    results = [
+        run_scenario(engine_class, fake_chain_factory, contract_manager, script)
+        for engine_class in ENGINES
+    ]
+    (gevent_received, gevent_chain), (async_received, async_chain) = results
+    assert gevent_received == async_received
+    return gevent_received, gevent_chain, async_chain
+
+
+def test_initial_sync_parity(fake_chain_factory, contract_manager):
+    received, gevent_chain, async_chain = run_both(
+        fake_chain_factory, contract_manager, sync
+    )
+
+    confirmed = [(e["blockNumber"], e["logIndex"]) for e in received["confirmed"]]
+    assert confirmed == sorted(set(confirmed))
+    expected = [
+        (int(log["blockNumber"], 16), int(log["logIndex"], 16))
+        for log in gevent_chain.logs
+        if int(log["blockNumber"], 16) <= 56
+    ]
+    assert confirmed[: len(expected)] == expected
+    assert received["confirmed"][0]["event"] == "ChannelOpened"
+    assert received["confirmed"][0]["args"]["participant1"] == Web3.toChecksumAddress(
+        PARTICIPANT1
+    )
+    assert received["confirmed"][0]["address"] == TOKEN_NETWORK_ADDRESS
+
+    # the async engine split every sync chunk into several concurrent windows
+    assert async_chain.count_requests("eth_getLogs") > gevent_chain.count_requests(
+        "eth_getLogs"
+    )
+
+
+def test_reorg_rewind_parity(fake_chain_factory, contract_manager):
+    def script(chain, engine):
+        sync(chain, engine)
+        chain.reorg(58, new_head=62)
+        chain.add_event(
+            59,
+            TOKEN_NETWORK_ADDRESS,
+            contract_manager.get_event_abi(CONTRACT_TOKEN_NETWORK, "ChannelClosed"),
+            channel_identifier=1,
+            closing_participant=PARTICIPANT2,
+            nonce=7,
+        )
+        engine.update()
+        assert engine.listener.confirmed_head_number == 58
+        assert engine.listener.unconfirmed_head_number == 62
+
+    received, _, _ = run_both(fake_chain_factory, contract_manager, script)
+
+    closed = [e for e in received["unconfirmed"] if e["event"] == "ChannelClosed"]
+    assert [e["blockNumber"] for e in closed] == [59]
+    # events of blocks that were not reorganized are not handed out again
+    unconfirmed = [(e["blockHash"], e["logIndex"]) for e in received["unconfirmed"]]
+    assert len(unconfirmed) == len(set(unconfirmed))
+
+
+@pytest.mark.parametrize("engine_class", ENGINES)
+def test_confirmed_head_reorg_aborts(
+    engine_class, fake_chain_factory, contract_manager
+):
+    def script(chain, engine):
+        sync(chain, engine)
+        chain.reorg(40, new_head=61)
+        with pytest.raises(SystemExit):
+            engine.update()
+
+    run_scenario(engine_class, fake_chain_factory, contract_manager, script)
@@ -0,0 +1,117 @@
+"""Adaptive poll delays and the global RPC budget"""
+import pytest
+
+from poller_service import poll_scheduler
+from poller_service.poll_scheduler import PollScheduler
+
+from test_listener_parity import AsyncEngine, populate
+
+NOW = 1_000_000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freezes the time seen by the scheduler, the test advances it explicitly"""
+    current = {"time": NOW}
+    monkeypatch.setattr(poll_scheduler.time, "time", lambda: current["time"])
+    return current
+
+
+def synced_scheduler(**kwargs) -> PollScheduler:
+    """Returns a scheduler that saw block 100 mined right now, every 15 seconds"""
+    scheduler = PollScheduler(initial_block_time=15.0, **kwargs)
+    scheduler.observe_head(99, int(NOW) - 15)
+    scheduler.observe_head(100, int(NOW))
+    return scheduler
+
+
+def test_block_time_estimate():
+    scheduler = PollScheduler(initial_block_time=15.0, smoothing=0.5)
+    scheduler.observe_head(10, 1000)
+    scheduler.observe_head(12, 1010)
+
+    assert scheduler.block_time == pytest.approx(10.0)
+    # older heads don't change the estimate
+    scheduler.observe_head(11, 1200)
+    assert scheduler.block_time == pytest.approx(10.0)
+
+
+def test_dormant_listener_backs_off(clock):
+    scheduler = synced_scheduler(max_backoff_blocks=4)
+
+    delays = [
+        scheduler.next_poll_delay("a", 100, new_events=0, cost=1) for _ in range(4)
+    ]
+    assert delays == [31.0, 61.0, 61.0, 61.0]
+
+    # activity resets the interval to a single block
+    assert scheduler.next_poll_delay("a", 100, new_events=3, cost=1) == 16.0
+    # a pass that found no new block keeps the interval
+    assert scheduler.next_poll_delay("a", 100, new_events=None, cost=1) == 16.0
+
+
+def test_late_block_retries_back_off_geometrically(clock):
+    scheduler = synced_scheduler()
+    expected = NOW + 15 + scheduler.poll_margin
+
+    retries = []
+    for _ in range(4):
+        clock["time"] = expected + (retries[-1] if retries else 0.1)
+        delay = scheduler.next_poll_delay("a", 100, new_events=None, cost=1)
+        retries.append(clock["time"] + delay - expected)
+
+    assert retries == [7.5, 15.0, 30.0, 60.0]
+
+
+def test_late_block_retry_is_capped(clock):
+    scheduler = synced_scheduler(max_backoff_blocks=4)
+    max_delay = 4 * scheduler.block_time
+
+    # heads of a lagging node, or a node clock far behind
+    for head_age in (600, 6 * 3600, NOW):
+        clock["time"] = NOW + head_age
+        delay = scheduler.next_poll_delay("a", 100, new_events=None, cost=1)
+        assert 0 < delay <= max_delay
+
+
+def test_budget_spaces_polls(clock):
+    scheduler = synced_scheduler(rpc_budget=2.0)
+
+    assert scheduler.catch_up_delay(4) == 0.0
+    assert scheduler.catch_up_delay(4) == 2.0
+    assert scheduler.catch_up_delay(2) == 4.0
+
+
+def test_budget_fills_gaps_before_future_polls(clock):
+    scheduler = synced_scheduler(rpc_budget=1.0)
+
+    # a poll reserved for the next block doesn't hold back the ones before it
+    assert scheduler.next_poll_delay("a", 100, new_events=1, cost=5) == 16.0
+    assert scheduler.catch_up_delay(5) == 0.0
+    assert scheduler.catch_up_delay(10) == 5.0
+    assert scheduler.next_poll_delay("b", 100, new_events=1, cost=2) == 21.0
+
+
+def test_async_listener_reserves_every_get_logs_request(
+    clock, fake_chain_factory, contract_manager
+):
+    chain = fake_chain_factory(60)
+    populate(chain, contract_manager, 60)
+    scheduler = PollScheduler(rpc_budget=1000.0)
+    engine = AsyncEngine(
+        chain,
+        contract_manager=contract_manager,
+        required_confirmations=4,
+        sync_chunk_size=25,
+        scheduler=scheduler,
+    )
+    engine.listener.add_confirmed_listener([None], lambda event: None)
+    engine.listener.add_unconfirmed_listener([None], lambda event: None)
+    try:
+        engine.update()
+    finally:
+        engine.close()
+
+    # one slot per window and callback, not one per callback
+    assert chain.count_requests("eth_getLogs") > 2
+    assert len(scheduler.reservations) == chain.count_requests("eth_getLogs")
@@ -0,0 +1,127 @@
+"""Trace spans of the listener passes and the sampling profiler"""
+import json
+import re
+import signal
+import time
+from collections import defaultdict
+
+import pytest
+
+from poller_service.profiling import SamplingProfiler, tracer
+
+from test_listener_parity import AsyncEngine, GeventEngine, populate
+
+
+@pytest.fixture
+def trace_path(tmp_path):
+    """Enables the global tracer for the test, returns the trace file"""
+    path = str(tmp_path / "trace.json")
+    tracer.spans.clear()
+    tracer.tracks.clear()
+    tracer.enable(path, duration=600)
+    yield path
+    tracer.stop()
+
+
+def read_spans(path: str) -> dict:
+    """Returns the spans of a trace file grouped by track name"""
+    with open(path) as trace_file:
+        events = json.load(trace_file)["traceEvents"]
+    track_names = {
+        event["tid"]: event["args"]["name"] for event in events if event["ph"] == "M"
+    }
+    spans: dict = defaultdict(list)
+    for event in events:
+        if event["ph"] == "X":
+            spans[track_names[event["tid"]]].append(event)
+    return spans
+
+
+def test_gevent_pass_stages(trace_path, fake_chain_factory, contract_manager):
+    chain = fake_chain_factory(30)
+    populate(chain, contract_manager, 30)
+    engine = GeventEngine(
+        chain,
+        contract_manager=contract_manager,
+        required_confirmations=4,
+        sync_chunk_size=30,
+    )
+    engine.listener.add_confirmed_listener([None], lambda event: None)
+    engine.update()
+    tracer.stop()
+
+    spans = read_spans(trace_path)
+    assert list(spans) == [engine.listener.contract_address]
+    (track_spans,) = spans.values()
+    assert {span["name"] for span in track_spans} == {
+        "reorg_check",
+        "get_events",
+        "decode_event",
+        "callback",
+    }
+    # every event is decoded and handed to the callback once
+    names = [span["name"] for span in track_spans]
+    assert names.count("decode_event") == names.count("callback") > 0
+
+
+def test_concurrent_fetches_get_own_tracks(
+    trace_path, fake_chain_factory, contract_manager
+):
+    chain = fake_chain_factory(60)
+    populate(chain, contract_manager, 60)
+    engine = AsyncEngine(
+        chain,
+        contract_manager=contract_manager,
+        required_confirmations=4,
+        sync_chunk_size=60,
+    )
+    engine.listener.add_confirmed_listener([None], lambda event: None)
+    engine.listener.add_unconfirmed_listener([None], lambda event: None)
+    try:
+        engine.update()
+    finally:
+        engine.close()
+    tracer.stop()
+
+    spans = read_spans(trace_path)
+    fetch_tracks = [name for name in spans if "/fetch" in name]
+    assert len(fetch_tracks) > 1
+    for name in fetch_tracks:
+        # spans of one track either nest or follow each other
+        track_spans = sorted(spans[name], key=lambda span: span["ts"])
+        fetches = [span for span in track_spans if span["name"] == "get_events"]
+        for previous, following in zip(fetches, fetches[1:]):
+            assert previous["ts"] + previous["dur"] <= following["ts"]
+        stages = {span["name"] for span in track_spans}
+        assert stages == {"get_events", "rpc_read", "rpc_parse", "format_logs"}
+
+
+def busy_loop(seconds: float) -> int:
+    total = 0
+    end = time.time() + seconds
+    while time.time() < end:
+        total += sum(range(1000))
+    return total
+
+
+def test_sampling_profiler_writes_collapsed_stacks(tmp_path):
+    path = str(tmp_path / "profile.txt")
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start(path, duration=0.2)
+    try:
+        # the profiler stops itself in the first sample after the deadline
+        for _ in range(20):
+            busy_loop(0.1)
+            if not profiler.running:
+                break
+        assert not profiler.running
+        assert signal.getsignal(signal.SIGPROF) == signal.SIG_DFL
+    finally:
+        profiler.stop()
+
+    with open(path) as profile_file:
+        lines = profile_file.read().splitlines()
+    assert lines
+    for line in lines:
+        assert re.match(r"^\S.* \d+$", line)
+    assert any("busy_loop (" in line for line in lines)